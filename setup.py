@@ -13,7 +13,7 @@ setup(
     url = 'https://github.com/kaleidos/django-supertools',
     license = 'BSD',
     include_package_data = True,
-    packages = find_packages(),
+    packages = find_packages(exclude=["tests", "tests.*"]),
     install_requires=[
         'pytz',
     ],
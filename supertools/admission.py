@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""Admission control (load shedding).
+
+A `ConcurrencyLimiter` bounds the number of requests in flight for a view or
+a group of views inside a process. When it is saturated a request may wait a
+short time for a free slot and is otherwise rejected immediately, so a slow
+downstream can only tie up its own slots instead of every worker thread.
+"""
+
+from __future__ import absolute_import
+
+import threading
+import time
+
+
+class ConcurrencyLimiter(object):
+    """Counting semaphore with a bounded wait.
+
+    :param max_in_flight: Maximum number of concurrent holders.
+    """
+
+    def __init__(self, max_in_flight):
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0
+        self._condition = threading.Condition(threading.Lock())
+
+    def acquire(self, timeout=0):
+        """Take a slot waiting at most `timeout` seconds. Returns False on failure."""
+        with self._condition:
+            if self.in_flight >= self.max_in_flight and timeout:
+                deadline = time.time() + timeout
+                while self.in_flight >= self.max_in_flight:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+
+            if self.in_flight >= self.max_in_flight:
+                return False
+
+            self.in_flight += 1
+            return True
+
+    def release(self):
+        with self._condition:
+            self.in_flight -= 1
+            self._condition.notify()
+
+
+class Slot(object):
+    """Slot taken from a limiter, released once.
+
+    Has a `close` method so it can be registered in the closable objects of
+    a streaming response, keeping the slot until the content is sent.
+    """
+
+    def __init__(self, limiter):
+        self.limiter = limiter
+        self.released = False
+
+    def release(self):
+        if not self.released:
+            self.released = True
+            self.limiter.release()
+
+    close = release
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(name, max_in_flight):
+    """Return the process wide limiter registered as `name`, creating it if needed."""
+    try:
+        return _limiters[name]
+    except KeyError:
+        with _limiters_lock:
+            if name not in _limiters:
+                _limiters[name] = ConcurrencyLimiter(max_in_flight)
+            return _limiters[name]
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""Per request database routing.
+
+Views pin the database alias used for reads while they handle a request with
+`use_database` (and `iter_using_database` while their content is streamed),
+and `ReplicaRouter` (to be added to DATABASE_ROUTERS) sends reads to the
+pinned alias and writes to SUPERTOOLS_PRIMARY_DATABASE, even for objects
+read from a replica.
+"""
+
+from __future__ import absolute_import
+
+import contextlib
+import threading
+
+from django.conf import settings
+
+
+PRIMARY_DATABASE = getattr(settings, "SUPERTOOLS_PRIMARY_DATABASE", "default")
+
+_state = threading.local()
+
+
+def get_read_database():
+    """Alias pinned for reads in the current thread, or None."""
+    return getattr(_state, "alias", None)
+
+
+@contextlib.contextmanager
+def use_database(alias):
+    """Pin `alias` for reads inside the block."""
+    previous = get_read_database()
+    _state.alias = alias
+    try:
+        yield
+    finally:
+        _state.alias = previous
+
+
+def iter_using_database(iterable, alias):
+    """
+    Iterate `iterable` (e.g. streamed response content) with `alias` pinned,
+    for content produced after the view has returned.
+    """
+    with use_database(alias):
+        for item in iterable:
+            yield item
+
+
+class ReplicaRouter(object):
+    primary_database = PRIMARY_DATABASE
+
+    def db_for_read(self, model, **hints):
+        return get_read_database()
+
+    def db_for_write(self, model, **hints):
+        # Otherwise django writes instances back to the database they were
+        # read from, which may be a replica.
+        return self.primary_database
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary.
+        return True
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""Server-Sent Events encoding and event sources.
+
+An event source is any object with a `listen(channel, last_event_id, timeout)`
+method returning an iterator of `Event` instances, that yields None every
+time `timeout` seconds pass without events (used to send heartbeats).
+`InMemoryBroker` is a process local implementation, suitable for tests and
+single process deployments.
+"""
+
+from __future__ import absolute_import
+
+import collections
+import itertools
+import threading
+import time
+
+from . import json
+
+
+class Event(object):
+    """
+    :param data: Event payload, encoded with `supertools.json.dumps`.
+    :param id: Event id, sent back by clients as `Last-Event-ID` on reconnection.
+    :param event: Event type name.
+    """
+
+    __slots__ = ("data", "id", "event")
+
+    def __init__(self, data, id=None, event=None):
+        self.data = data
+        self.id = id
+        self.event = event
+
+    def encode(self):
+        lines = []
+        if self.id is not None:
+            lines.append("id: {}".format(self.id))
+        if self.event is not None:
+            lines.append("event: {}".format(self.event))
+        for line in json.dumps(self.data).splitlines() or [""]:
+            lines.append("data: {}".format(line))
+        return ("\n".join(lines) + "\n\n").encode("utf-8")
+
+
+HEARTBEAT = b": heartbeat\n\n"
+
+
+class InMemoryBroker(object):
+    """
+    Process local pub/sub keeping the last `history` events of each channel.
+    Each channel has its own condition, so listeners are only woken up by
+    events of their channel.
+    """
+
+    def __init__(self, history=1000):
+        self.history = history
+        self._ids = itertools.count(1)
+        self._channels = collections.defaultdict(lambda: collections.deque(maxlen=self.history))
+        self._lock = threading.Lock()
+        self._conditions = {}
+
+    def _get_condition(self, channel):
+        condition = self._conditions.get(channel)
+        if condition is None:
+            condition = self._conditions[channel] = threading.Condition(self._lock)
+        return condition
+
+    def publish(self, channel, data, event=None):
+        with self._lock:
+            result = Event(data, id=next(self._ids), event=event)
+            self._channels[channel].append(result)
+            self._get_condition(channel).notify_all()
+        return result
+
+    def _pending(self, channel, cursor):
+        return [e for e in self._channels.get(channel, ()) if e.id > cursor]
+
+    def _wait(self, channel, cursor, timeout):
+        """Pending events of `channel`, waiting up to `timeout` seconds for them."""
+        condition = self._get_condition(channel)
+        deadline = None if timeout is None else time.time() + timeout
+        events = self._pending(channel, cursor)
+        while not events:
+            if deadline is None:
+                condition.wait()
+            else:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                condition.wait(remaining)
+            events = self._pending(channel, cursor)
+        return events
+
+    def listen(self, channel, last_event_id=None, timeout=None):
+        with self._lock:
+            try:
+                cursor = int(last_event_id)
+            except (TypeError, ValueError):
+                events = self._channels.get(channel)
+                cursor = events[-1].id if events else 0
+
+        while True:
+            with self._lock:
+                events = self._wait(channel, cursor, timeout)
+
+            if not events:
+                yield None
+                continue
+
+            for event in events:
+                cursor = event.id
+                yield event
@@ -20,6 +20,11 @@ class BaseException(Exception):
         self.content = detail or self.default_content
 
 
+class RequestEntityTooLarge(BaseException):
+    default_content = _("Request entity too large")
+    response_class = http.RequestEntityTooLarge
+
+
 class UnsupportedMediaType(BaseException):
     response_class = http.UnsupportedMediaType
 
@@ -71,11 +76,29 @@ class IntegrityError(BaseException):
     response_class = http.Conflict
 
 
+class TooManyRequests(BaseException):
+    default_content = _("Too many requests")
+    response_class = http.TooManyRequests
+
+    def __init__(self, detail=None, retry_after=None):
+        super(TooManyRequests, self).__init__(detail)
+        self.retry_after = retry_after
+
+
 class InternalError(BaseException):
     default_content = _("Internal server error")
     response_class = http.InternalServerError
 
 
+class ServiceUnavailable(BaseException):
+    default_content = _("Service temporarily unavailable")
+    response_class = http.ServiceUnavailable
+
+    def __init__(self, detail=None, retry_after=None):
+        super(ServiceUnavailable, self).__init__(detail)
+        self.retry_after = retry_after
+
+
 @contextmanager
 def supress_exceptions(*exceptions):
     """
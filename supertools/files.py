@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+"""File responses with HTTP range support.
+
+Whole files and single ranges (through a `FileRange`) are sent with
+`FileResponse`, which lets the WSGI server use `wsgi.file_wrapper` (sendfile).
+Multiple ranges are streamed in bounded chunks as `multipart/byteranges`. When offloading is
+configured the response only carries an `X-Accel-Redirect` (nginx) or
+`X-Sendfile` (apache, lighttpd) header and the front server sends the file,
+including range handling, without it passing through python at all.
+"""
+
+from __future__ import absolute_import
+
+import mimetypes
+import os
+import re
+import uuid
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.http import http_date, parse_http_date_safe
+
+from . import http
+
+
+FILE_OFFLOAD = getattr(settings, "SUPERTOOLS_FILE_OFFLOAD", None)
+FILE_OFFLOAD_ROOT = getattr(settings, "SUPERTOOLS_FILE_OFFLOAD_ROOT", None)
+FILE_OFFLOAD_URL = getattr(settings, "SUPERTOOLS_FILE_OFFLOAD_URL", "/protected/")
+FILE_CHUNK_SIZE = 64 * 1024
+
+MAX_RANGES = 32
+
+_range_rx = re.compile(r"^\s*(\d*)\s*-\s*(\d*)\s*$")
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range_header(header, size):
+    """Parse a `Range` header value.
+
+    :return: List of inclusive (start, end) tuples, or None if the header is
+        malformed or not in bytes (and must be ignored, as the RFC says).
+    :raises RangeNotSatisfiable: when no range overlaps the file.
+    """
+    unit, _, ranges_spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or not ranges_spec:
+        return None
+
+    ranges = []
+    for spec in ranges_spec.split(","):
+        match = _range_rx.match(spec)
+        if match is None:
+            return None
+
+        first, last = match.groups()
+        if not first and not last:
+            return None
+
+        if not first:
+            # Suffix range: last N bytes.
+            length = int(last)
+            if length == 0 or size == 0:
+                continue
+            start, end = max(size - length, 0), size - 1
+        else:
+            start = int(first)
+            end = int(last) if last else max(start, size - 1)
+            if end < start:
+                return None
+            if start >= size:
+                continue
+            end = min(end, size - 1)
+
+        ranges.append((start, end))
+
+    if not ranges:
+        raise RangeNotSatisfiable()
+    if len(ranges) > MAX_RANGES:
+        # Too many ranges is a well known denial of service vector.
+        return None
+    return ranges
+
+
+def get_etag(stat):
+    return '"{:x}-{:x}"'.format(int(stat.st_mtime), stat.st_size)
+
+
+def if_range_matches(request, etag, mtime):
+    """Evaluate `If-Range`: whether the range request can be honored."""
+    value = request.META.get("HTTP_IF_RANGE")
+    if not value:
+        return True
+    if value.startswith('"') or value.startswith("W/"):
+        # Weak etags never match for ranges.
+        return value == etag
+
+    date = parse_http_date_safe(value)
+    return date is not None and int(mtime) <= date
+
+
+def iter_file_range(f, start, end, chunk_size=FILE_CHUNK_SIZE):
+    f.seek(start)
+    remaining = end - start + 1
+    while remaining > 0:
+        chunk = f.read(min(chunk_size, remaining))
+        if not chunk:
+            break
+        remaining -= len(chunk)
+        yield chunk
+
+
+def iter_multipart_ranges(f, ranges, size, content_type, boundary):
+    try:
+        for start, end in ranges:
+            yield ("--{}\r\nContent-Type: {}\r\nContent-Range: bytes {}-{}/{}\r\n\r\n".format(
+                boundary, content_type, start, end, size)).encode("ascii")
+            for chunk in iter_file_range(f, start, end):
+                yield chunk
+            yield b"\r\n"
+        yield "--{}--\r\n".format(boundary).encode("ascii")
+    finally:
+        f.close()
+
+
+class FileRange(object):
+    """
+    File object limited to the inclusive byte range `start`-`end` of `f`.
+
+    It exposes the underlying `fileno()`, positioned at `start`: file wrappers
+    using sendfile (gunicorn, mod_wsgi) send from the current position up to
+    the response Content-Length, the others call `read()`.
+    """
+
+    def __init__(self, f, start, end):
+        f.seek(start)
+        self.file = f
+        self.remaining = end - start + 1
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def read(self, size=-1):
+        if size is None or size < 0 or size > self.remaining:
+            size = self.remaining
+        chunk = self.file.read(size) if size else b""
+        self.remaining -= len(chunk)
+        return chunk
+
+    def close(self):
+        self.file.close()
+
+
+def get_offload_response(path, content_type, offload):
+    if offload == "x-accel-redirect":
+        root = FILE_OFFLOAD_ROOT or settings.MEDIA_ROOT
+        relative = os.path.relpath(os.path.abspath(path), os.path.abspath(root))
+        if relative.startswith(os.pardir):
+            raise ValueError("{} is outside of SUPERTOOLS_FILE_OFFLOAD_ROOT".format(path))
+        header, value = "X-Accel-Redirect", FILE_OFFLOAD_URL.rstrip("/") + "/" + relative.replace(os.sep, "/")
+    elif offload == "x-sendfile":
+        header, value = "X-Sendfile", os.path.abspath(path)
+    else:
+        raise ValueError("Unknown file offload: {!r}".format(offload))
+
+    # Plain django response: content serializers (`ApiMixin`) leave it alone.
+    response = HttpResponse(b"", content_type=content_type)
+    response[header] = value
+    return response
+
+
+def file_response(request, path, content_type=None, filename=None,
+                  as_attachment=False, offload=FILE_OFFLOAD):
+    """Build a response serving the file at `path`, honoring `Range` requests.
+
+    :param offload: None, "x-accel-redirect" or "x-sendfile".
+    """
+    if content_type is None:
+        content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+
+    if offload:
+        response = get_offload_response(path, content_type, offload)
+    else:
+        response = _local_file_response(request, path, content_type)
+
+    if filename or as_attachment:
+        disposition = "attachment" if as_attachment else "inline"
+        filename = filename or os.path.basename(path)
+        response["Content-Disposition"] = '{}; filename="{}"'.format(
+            disposition, filename.replace('"', ""))
+    return response
+
+
+def _local_file_response(request, path, content_type):
+    stat = os.stat(path)
+    size = stat.st_size
+    etag = get_etag(stat)
+
+    ranges = None
+    range_header = request.META.get("HTTP_RANGE")
+    if range_header and request.method in ("GET", "HEAD") and if_range_matches(request, etag, stat.st_mtime):
+        try:
+            ranges = parse_range_header(range_header, size)
+        except RangeNotSatisfiable:
+            response = HttpResponse(b"", status=http.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+            response["Content-Range"] = "bytes */{}".format(size)
+            return response
+
+    f = open(path, "rb")
+    if ranges is None:
+        response = http.FileResponse(f, content_type=content_type)
+        response["Content-Length"] = str(size)
+    elif len(ranges) == 1:
+        start, end = ranges[0]
+        response = http.FileResponse(FileRange(f, start, end),
+                                     status=http.HTTP_206_PARTIAL_CONTENT,
+                                     content_type=content_type)
+        response["Content-Range"] = "bytes {}-{}/{}".format(start, end, size)
+        response["Content-Length"] = str(end - start + 1)
+    else:
+        boundary = uuid.uuid4().hex
+        response = http.StreamingHttpResponse(
+            iter_multipart_ranges(f, ranges, size, content_type, boundary),
+            status=http.HTTP_206_PARTIAL_CONTENT,
+            content_type="multipart/byteranges; boundary={}".format(boundary))
+
+    response["Accept-Ranges"] = "bytes"
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(stat.st_mtime)
+    return response
@@ -9,8 +9,12 @@ Code taken from django rest framework.
 
 from django.http.response import HttpResponseBase
 from django.http import HttpResponse
+from django.http import StreamingHttpResponse
+from django.http import FileResponse
 from django.http import HttpResponseRedirect
 from django.http import HttpResponsePermanentRedirect
+from django.utils import six
+from django.utils.functional import Promise
 
 
 def is_informational(code):
@@ -64,6 +68,7 @@ HTTP_414_REQUEST_URI_TOO_LONG = 414
 HTTP_415_UNSUPPORTED_MEDIA_TYPE = 415
 HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE = 416
 HTTP_417_EXPECTATION_FAILED = 417
+HTTP_422_UNPROCESSABLE_ENTITY = 422
 HTTP_428_PRECONDITION_REQUIRED = 428
 HTTP_429_TOO_MANY_REQUESTS = 429
 HTTP_431_REQUEST_HEADER_FIELDS_TOO_LARGE = 431
@@ -78,6 +83,10 @@ HTTP_511_NETWORK_AUTHENTICATION_REQUIRED = 511
 class HttpResponse(HttpResponse):
     def __init__(self, content="", *args, **kwarg):
         self.content_data = content
+        if not isinstance(content, six.string_types + (six.binary_type, Promise)):
+            # Structured data is encoded later by a serializer, avoid consuming
+            # iterators (like streamed records) while building the response.
+            content = b""
         super(HttpResponse, self).__init__(content, *args, **kwarg)
 
     @property
@@ -101,6 +110,9 @@ class Accepted(HttpResponse):
 class NoContent(HttpResponse):
     status_code = HTTP_204_NO_CONTENT
 
+class PartialContent(HttpResponse):
+    status_code = HTTP_206_PARTIAL_CONTENT
+
 class MultipleChoices(HttpResponse):
     status_code = HTTP_300_MULTIPLE_CHOICES
 
@@ -146,9 +158,18 @@ class Gone(HttpResponse):
 class PreconditionFailed(HttpResponse):
     status_code = HTTP_412_PRECONDITION_FAILED
 
+class RequestEntityTooLarge(HttpResponse):
+    status_code = HTTP_413_REQUEST_ENTITY_TOO_LARGE
+
 class UnsupportedMediaType(HttpResponse):
     status_code = HTTP_415_UNSUPPORTED_MEDIA_TYPE
 
+class RequestedRangeNotSatisfiable(HttpResponse):
+    status_code = HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE
+
+class UnprocessableEntity(HttpResponse):
+    status_code = HTTP_422_UNPROCESSABLE_ENTITY
+
 class TooManyRequests(HttpResponse):
     status_code = HTTP_429_TOO_MANY_REQUESTS
 
@@ -157,3 +178,6 @@ class InternalServerError(HttpResponse):
 
 class NotImplemented(HttpResponse):
     status_code = HTTP_501_NOT_IMPLEMENTED
+
+class ServiceUnavailable(HttpResponse):
+    status_code = HTTP_503_SERVICE_UNAVAILABLE
@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+"""Database query instrumentation.
+
+`capture_queries` counts the queries executed on every database connection,
+their total time and how many times each statement shape (fingerprint) has
+been repeated, which is the usual signature of N+1 query problems.
+"""
+
+from __future__ import absolute_import
+
+import collections
+import contextlib
+import re
+import time
+
+from django.db import connections
+
+
+_fingerprint_rxs = (
+    (re.compile(r"'(?:[^']|'')*'"), "?"),
+    (re.compile(r"\b\d+(?:\.\d+)?\b"), "?"),
+    (re.compile(r"\(\s*(?:\?|%s)(?:\s*,\s*(?:\?|%s))*\s*\)"), "(...)"),
+    (re.compile(r"\s+"), " "),
+)
+
+
+def fingerprint(sql):
+    """Normalize a sql statement replacing literals and IN lists by placeholders."""
+    for rx, replacement in _fingerprint_rxs:
+        sql = rx.sub(replacement, sql)
+    return sql.strip()
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class QueryStats(object):
+    """Counters of the queries executed while capturing."""
+
+    def __init__(self):
+        self.count = 0
+        self.time = 0.0
+        self.fingerprints = collections.Counter()
+
+    def record(self, sql, duration):
+        self.count += 1
+        self.time += duration
+        self.fingerprints[fingerprint(sql)] += 1
+
+    @property
+    def duplicates(self):
+        """Fingerprints executed more than once, with their count."""
+        return dict((sql, n) for sql, n in self.fingerprints.items() if n > 1)
+
+    def __call__(self, execute, sql, params, many, context):
+        # connection.execute_wrapper() protocol
+        start = time.time()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.record(sql, time.time() - start)
+
+
+class _ExitStack(object):
+    """Minimal `contextlib.ExitStack` for python 2."""
+
+    def __init__(self):
+        self._exits = []
+
+    def enter_context(self, cm):
+        result = cm.__enter__()
+        self._exits.append(cm.__exit__)
+        return result
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        suppressed = False
+        while self._exits:
+            if self._exits.pop()(*exc_info):
+                suppressed = True
+                exc_info = (None, None, None)
+        return suppressed
+
+
+ExitStack = getattr(contextlib, "ExitStack", _ExitStack)
+
+
+class _TimedCursor(object):
+    """Cursor proxy recording the executed statements in a `QueryStats`."""
+
+    def __init__(self, cursor, stats):
+        self.cursor = cursor
+        self.stats = stats
+
+    def __getattr__(self, attr):
+        return getattr(self.cursor, attr)
+
+    def __iter__(self):
+        return iter(self.cursor)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return self.cursor.__exit__(*exc_info)
+
+    def execute(self, sql, params=None):
+        start = time.time()
+        try:
+            return self.cursor.execute(sql, params)
+        finally:
+            self.stats.record(sql, time.time() - start)
+
+    def executemany(self, sql, param_list):
+        start = time.time()
+        try:
+            return self.cursor.executemany(sql, param_list)
+        finally:
+            self.stats.record(sql, time.time() - start)
+
+
+@contextlib.contextmanager
+def _wrap_cursors(connection, stats):
+    """
+    Django < 2.0 counterpart of `connection.execute_wrapper()`: cursors
+    created by this connection are proxied by `_TimedCursor`. Connections are
+    thread local, so this does not affect other threads, and unlike the debug
+    query log it neither opens connections nor touches the request signals.
+    """
+    saved = dict((name, connection.__dict__[name]) for name in ("make_cursor", "make_debug_cursor")
+                 if name in connection.__dict__)
+    make_cursor, make_debug_cursor = connection.make_cursor, connection.make_debug_cursor
+    connection.make_cursor = lambda cursor: _TimedCursor(make_cursor(cursor), stats)
+    connection.make_debug_cursor = lambda cursor: _TimedCursor(make_debug_cursor(cursor), stats)
+    try:
+        yield
+    finally:
+        del connection.make_cursor, connection.make_debug_cursor
+        connection.__dict__.update(saved)
+
+
+@contextlib.contextmanager
+def capture_queries(stats=None):
+    """
+    Collect `QueryStats` for every database connection in the block, adding
+    to `stats` when given.
+    """
+    if stats is None:
+        stats = QueryStats()
+
+    with ExitStack() as stack:
+        for connection in connections.all():
+            if hasattr(connection, "execute_wrapper"):
+                stack.enter_context(connection.execute_wrapper(stats))
+            else:
+                stack.enter_context(_wrap_cursors(connection, stats))
+        yield stats
+
+
+def iter_captured(iterable, stats, callback):
+    """
+    Iterate `iterable` (e.g. streamed response content) capturing its queries
+    into `stats`, then call `callback(stats)` once it is exhausted.
+    """
+    with capture_queries(stats):
+        for item in iterable:
+            yield item
+    callback(stats)
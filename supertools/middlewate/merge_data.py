@@ -10,6 +10,9 @@ class RequestMergeDataMiddleware(object):
 
     Usefull for WTForms due it only accept one
     data parameter instead of two as django forms.
+
+    The body is parsed here, before views can install their own upload
+    handlers (see `serializers.MultiPart`).
     """
 
     def process_request(self, request):
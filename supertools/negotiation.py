@@ -10,11 +10,291 @@ three mechanisms:
 negotiation)
 3. Cache (transparent negotiation).
 
-This module implements the agent-driven negotiation.
+This module implements the agent-driven negotiation. Besides media types (`Accept`),
+`Negotiator` subclasses select content encodings, languages and charsets from their headers.
 """
 
 from __future__ import absolute_import
 
+import threading
+
+
+# Header parsing
+
+_PARSE_CACHE_SIZE = 1024
+_parse_cache = {}
+_parse_cache_lock = threading.Lock()
+
+
+def _split(value, separator):
+    """Split `value` on `separator`, ignoring separators inside quoted strings."""
+    if '"' not in value:
+        return value.split(separator)
+
+    parts = []
+    current = []
+    quoted = escaped = False
+    for char in value:
+        if escaped:
+            escaped = False
+        elif char == "\\" and quoted:
+            escaped = True
+        elif char == '"':
+            quoted = not quoted
+        elif char == separator and not quoted:
+            parts.append("".join(current))
+            current = []
+            continue
+        current.append(char)
+    parts.append("".join(current))
+    return parts
+
+
+def _unquote(value):
+    if len(value) >= 2 and value[0] == value[-1] == '"':
+        value = value[1:-1].replace('\\"', '"').replace("\\\\", "\\")
+    return value
+
+
+def _parse_header(value):
+    result = []
+    for element in _split(value, ","):
+        parts = _split(element, ";")
+        token = parts[0].strip().lower()
+        if not token:
+            continue
+
+        params = {}
+        q = 1.0
+        for part in parts[1:]:
+            key, sep, param_value = part.partition("=")
+            key = key.strip().lower()
+            if not sep or not key:
+                # Empty or malformed parameter.
+                continue
+            param_value = _unquote(param_value.strip())
+            if key == "q":
+                try:
+                    q = float(param_value)
+                except ValueError:
+                    q = None
+                # Anything after q are accept extensions, not parameters.
+                break
+            params[key] = param_value
+
+        if q is None or q != q:
+            # Invalid weight: ignore the element.
+            continue
+        result.append((token, params, min(max(q, 0.0), 1.0)))
+
+    return tuple(result)
+
+
+def parse_header(value):
+    """Parse the value of an Accept* header.
+
+    Quoted strings, empty parameters and invalid weights are tolerated.
+    Results are memoized since the same header values repeat a lot.
+
+    :return: Tuple of (lowercased token, params dict, q) tuples in header order.
+    """
+    try:
+        return _parse_cache[value]
+    except KeyError:
+        pass
+
+    result = _parse_header(value)
+    with _parse_cache_lock:
+        if len(_parse_cache) >= _PARSE_CACHE_SIZE:
+            _parse_cache.clear()
+        _parse_cache[value] = result
+    return result
+
+
+# Negotiators
+
+class Negotiator(object):
+    """Select the best of the server offers for an Accept* header value.
+
+    Offers are precompiled on construction into lookup tables, so selecting
+    is a single pass over the header elements: each element updates the most
+    specific match of the offers it applies to, as RFC 7231 requires, and the
+    offer with the highest weight wins, ties going to the earlier offer
+    (server preference). Offers with weight 0 are never selected.
+
+    :param offers: Offered values, in server preference order.
+    """
+
+    def __init__(self, offers):
+        self.offers = tuple(offers)
+        self.compile()
+
+    def compile(self):
+        raise NotImplementedError
+
+    def candidates(self, token, params):
+        """Return offer indexes a header element applies to and its specificity."""
+        raise NotImplementedError
+
+    def default(self):
+        """Offer used when the header is absent."""
+        return self.offers[0] if self.offers else None
+
+    def implicit(self):
+        """Weights of offers acceptable even when the header omits them."""
+        return {}
+
+    def select(self, header):
+        if header is None:
+            return self.default()
+
+        matches = {}
+        for token, params, q in parse_header(header):
+            indexes, specificity = self.candidates(token, params)
+            for index in indexes:
+                current = matches.get(index)
+                if current is None or specificity > current[0]:
+                    matches[index] = (specificity, q)
+
+        weights = self.implicit()
+        for index, (specificity, q) in matches.items():
+            weights[index] = q
+
+        best = None
+        for index, q in weights.items():
+            if q > 0 and (best is None or (q, -index) > best):
+                best = (q, -index)
+
+        if best is None:
+            return None
+        return self.offers[-best[1]]
+
+
+class MediaTypeNegotiator(Negotiator):
+    """Negotiation of the `Accept` header.
+
+    Specificity: `*/*` < `type/*` < `type/subtype` < more media parameters.
+    Parameters an offer does not declare (e.g. `charset` for a plain
+    `application/json` offer) are ignored when matching it.
+    """
+
+    def compile(self):
+        self.parsed = []
+        self.by_type = {}
+        self.by_media_type = {}
+        for index, offer in enumerate(self.offers):
+            parsed = parse_header(offer)
+            token, params = parsed[0][:2] if parsed else ("", {})
+            type, _, subtype = token.partition("/")
+            self.parsed.append(params)
+            self.by_type.setdefault(type, []).append(index)
+            self.by_media_type.setdefault(token, []).append(index)
+        self.all = tuple(range(len(self.offers)))
+
+    def candidates(self, token, params):
+        if token == "*":
+            # Common invalid shorthand for */*.
+            token = "*/*"
+
+        type, _, subtype = token.partition("/")
+        if not subtype:
+            return (), 0
+
+        if type == "*":
+            if subtype != "*":
+                return (), 0
+            indexes, specificity = self.all, 0
+        elif subtype == "*":
+            indexes, specificity = self.by_type.get(type, ()), 1
+        else:
+            indexes, specificity = self.by_media_type.get(token, ()), 2
+
+        if params:
+            items = params.items()
+            indexes = [i for i in indexes
+                       if all(self.parsed[i].get(k, v) == v for k, v in items)]
+            specificity += len(params)
+        return indexes, specificity
+
+
+class EncodingNegotiator(Negotiator):
+    """Negotiation of the `Accept-Encoding` header.
+
+    `identity` is acceptable (with the lowest preference) unless excluded
+    with `identity;q=0` or `*;q=0`, and it is the default without header.
+    """
+
+    def compile(self):
+        self.by_token = {}
+        for index, offer in enumerate(self.offers):
+            self.by_token.setdefault(offer.strip().lower(), []).append(index)
+        self.all = tuple(range(len(self.offers)))
+
+    def candidates(self, token, params):
+        if token == "*":
+            return self.all, 0
+        return self.by_token.get(token, ()), 1
+
+    def default(self):
+        if "identity" in self.by_token:
+            return self.offers[self.by_token["identity"][0]]
+        return super(EncodingNegotiator, self).default()
+
+    def implicit(self):
+        return dict((index, 0.001) for index in self.by_token.get("identity", ()))
+
+
+class LanguageNegotiator(Negotiator):
+    """Negotiation of the `Accept-Language` header (RFC 4647 basic filtering).
+
+    A language range matches offers equal to it or starting with it followed
+    by "-" ("en" matches "en-US"), longer ranges being more specific.
+    """
+
+    def compile(self):
+        self.by_prefix = {}
+        for index, offer in enumerate(self.offers):
+            subtags = offer.strip().lower().replace("_", "-").split("-")
+            for length in range(1, len(subtags) + 1):
+                self.by_prefix.setdefault("-".join(subtags[:length]), []).append(index)
+        self.all = tuple(range(len(self.offers)))
+
+    def candidates(self, token, params):
+        if token == "*":
+            return self.all, 0
+        token = token.replace("_", "-")
+        return self.by_prefix.get(token, ()), token.count("-") + 1
+
+
+class CharsetNegotiator(Negotiator):
+    """Negotiation of the `Accept-Charset` header."""
+
+    def compile(self):
+        self.by_token = {}
+        for index, offer in enumerate(self.offers):
+            self.by_token.setdefault(offer.strip().lower(), []).append(index)
+        self.all = tuple(range(len(self.offers)))
+
+    def candidates(self, token, params):
+        if token == "*":
+            return self.all, 0
+        return self.by_token.get(token, ()), 1
+
+
+_negotiators = {}
+
+
+def get_negotiator(cls, offers):
+    """Return a compiled negotiator for `offers`, shared between calls."""
+    key = (cls, tuple(offers))
+    try:
+        return _negotiators[key]
+    except KeyError:
+        negotiator = _negotiators[key] = cls(key[1])
+        return negotiator
+
+
+# Media types
 
 def parse_media_range(media_range):
     """Parse a media range string.
@@ -24,16 +304,13 @@ def parse_media_range(media_range):
     :return: List of `MediaType` instances.
     """
     result = []
-    for media_type in media_range.split(","):
-        parts = media_type.split(";")
-        type_subtype = parts[0].split("/")
-        if len(type_subtype) == 1:
-            type = subtype = type_subtype
-        else:
-            type, subtype = type_subtype
-        params = dict(p.split("=") for p in parts[1:])
-        q = params.pop("q", 1)
-        result.append(MediaType(type, subtype, params, q))
+    for token, params, q in parse_header(media_range):
+        if token == "*":
+            token = "*/*"
+        type, _, subtype = token.partition("/")
+        if not subtype:
+            continue
+        result.append(MediaType(type, subtype, dict(params), q))
 
     return result
 
@@ -51,6 +328,8 @@ def parse_and_sort_media_range(media_range):
 def intersect_media_types(requested_media_types, supported_media_types):
     """Returns the `MediaType` resulting of the intersection between two sets of media types."""
     for requested_media_type in requested_media_types:
+        if requested_media_type.q <= 0:
+            continue
         for media_type in supported_media_types:
             if media_type.accepts(requested_media_type):
                 return media_type
@@ -69,8 +348,8 @@ class MediaType(object):
     :param q: Value of the relative quality factor. Must be between 0 and 1.
     """
     def __init__(self, type="*", subtype="*", params=None, q=1):
-        self.type = type.strip()
-        self.subtype = subtype.strip()
+        self.type = type.strip().lower()
+        self.subtype = subtype.strip().lower()
         if params is None:
             params = {}
         self.params = params
@@ -81,41 +360,46 @@ class MediaType(object):
             return True
 
         elif self.type == media_type.type:
-            return self.subtype == media_type.subtype or media_type.subtype == "*"
+            if self.subtype != media_type.subtype and media_type.subtype != "*":
+                return False
+            return all(self.params.get(k, v) == v for k, v in media_type.params.items())
 
         return False
 
+    @property
+    def specificity(self):
+        if self.type == "*":
+            return 0
+        if self.subtype == "*":
+            return 1
+        return 2 + len(self.params)
+
+    def sort_key(self):
+        """Total order by user agent's preference: weight, then specificity."""
+        return (self.q, self.specificity)
+
     def __str__(self):
         text = "{0.type}/{0.subtype}".format(self)
-        params = self.params
-        params = {"{}={}".format(key, value) for key, value in self.params.items()}
+        params = ["{}={}".format(key, value) for key, value in sorted(self.params.items())]
         if params:
             text = "{};{}".format(text, ";".join(params))
 
         return text
 
     def __lt__(self, other):
-        if self == other:
-            return False
-
-        if self.q != other.q:
-            return self.q < other.q
-
-        if self.type == "*":
-            return other.type != "*"
-
-        if self.subtype == "*":
-            return other.subtype != "*"
-
-        return len(self.params) < len(other.params)
+        return self.sort_key() < other.sort_key()
 
     def __gt__(self, other):
-        if self == other:
-            return False
-        return not self < other
+        return self.sort_key() > other.sort_key()
 
     def __eq__(self, other):
         return (self.type == other.type and
                 self.subtype == other.subtype and
                 self.q == other.q and
                 self.params == other.params)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash((self.type, self.subtype, self.q, tuple(sorted(self.params.items()))))
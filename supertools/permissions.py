@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""Helpers for `View.permissions` callables.
+
+Permissions are callables receiving the view and returning `False`
+(forbidden), an http response (returned as is) or anything else, including
+other falsy values such as None (granted).
+The `permission` decorator attaches evaluation hints to them:
+
+- `cost`: relative cost, cheaper permissions are evaluated first so they can
+  short-circuit expensive ones (declaration order is kept between equal costs).
+- `ttl`: for pure checks, whose result only depends on `key(view)`, the result
+  is cached across requests in the django cache for that many seconds.
+
+Results are always memoized for the lifetime of the request.
+"""
+
+from __future__ import absolute_import
+
+from django.conf import settings
+from django.core.cache import caches
+
+from . import http
+
+
+PERMISSIONS_CACHE = getattr(settings, "SUPERTOOLS_PERMISSIONS_CACHE", "default")
+
+_MISSING = object()
+
+
+def default_key(view):
+    """Identify a permission check by the request user and the url kwargs."""
+    user = getattr(view.request, "user", None)
+    user_pk = getattr(user, "pk", None)
+    kwargs = ",".join("{}={}".format(k, v) for k, v in sorted(view.kwargs.items()))
+    return "{}:{}".format(user_pk, kwargs)
+
+
+def permission(cost=0, ttl=None, key=default_key):
+    """Decorate a permission callable with evaluation hints."""
+    def decorator(fn):
+        fn.permission_cost = cost
+        fn.permission_ttl = ttl
+        fn.permission_key = key
+        return fn
+    return decorator
+
+
+def get_name(fn):
+    return "{}.{}".format(getattr(fn, "__module__", ""), getattr(fn, "__name__", repr(fn)))
+
+
+_sorted = {}
+
+
+def sort_by_cost(permissions):
+    """Return permissions ordered by declared cost, memoized per tuple."""
+    try:
+        return _sorted[permissions]
+    except (KeyError, TypeError):
+        pass
+
+    result = sorted(permissions, key=lambda fn: getattr(fn, "permission_cost", 0))
+    try:
+        _sorted[permissions] = result
+    except TypeError:
+        pass
+    return result
+
+
+def evaluate(fn, view):
+    """Evaluate a permission using the request memo and the shared cache."""
+    key = getattr(fn, "permission_key", default_key)(view)
+
+    memo = getattr(view.request, "_permissions_memo", None)
+    if memo is None:
+        memo = view.request._permissions_memo = {}
+
+    result = memo.get((fn, key), _MISSING)
+    if result is not _MISSING:
+        return result
+
+    ttl = getattr(fn, "permission_ttl", None)
+    if ttl:
+        cache = caches[PERMISSIONS_CACHE]
+        cache_key = "permissions:{}:{}".format(get_name(fn), key)
+        result = cache.get(cache_key, _MISSING)
+        if result is _MISSING:
+            result = fn(view)
+            # Responses are not pure results, only the granted/forbidden
+            # outcome is shared between requests.
+            if not isinstance(result, http.HttpResponseBase):
+                result = result != False
+                cache.set(cache_key, result, ttl)
+    else:
+        result = fn(view)
+
+    memo[(fn, key)] = result
+    return result
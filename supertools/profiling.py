@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""Profiling of single requests.
+
+`CProfiler` wraps the standard deterministic profiler. `SamplingProfiler`
+uses pyinstrument when it is installed, which has a much lower overhead on
+slow requests, and `get_profiler` falls back to cProfile otherwise.
+"""
+
+from __future__ import absolute_import
+
+import cProfile
+import os
+import pstats
+import time
+
+try:
+    import pyinstrument
+except ImportError:
+    pyinstrument = None
+
+
+class CProfiler(object):
+    name = "cprofile"
+    extension = "prof"
+
+    def __init__(self, limit=50):
+        self.limit = limit
+        self.profile = cProfile.Profile()
+
+    def start(self):
+        self.profile.enable()
+
+    def stop(self):
+        self.profile.disable()
+
+    def get_data(self):
+        """Most expensive functions by cumulative time."""
+        stats = pstats.Stats(self.profile)
+        stats.sort_stats("cumulative")
+
+        functions = []
+        for func in stats.fcn_list[:self.limit]:
+            primitive_calls, calls, total_time, cumulative_time, callers = stats.stats[func]
+            filename, line, name = func
+            functions.append({
+                "function": "{}:{}({})".format(filename, line, name),
+                "calls": calls,
+                "primitive_calls": primitive_calls,
+                "total_time": total_time,
+                "cumulative_time": cumulative_time,
+            })
+
+        return {"profiler": self.name, "total_time": stats.total_tt, "functions": functions}
+
+    def save(self, path):
+        self.profile.dump_stats(path)
+
+
+class SamplingProfiler(object):
+    name = "sampling"
+    extension = "html"
+
+    def __init__(self):
+        self.profiler = pyinstrument.Profiler()
+
+    def start(self):
+        self.profiler.start()
+
+    def stop(self):
+        self.profiler.stop()
+
+    def get_data(self):
+        return {"profiler": self.name, "report": self.profiler.output_text().splitlines()}
+
+    def save(self, path):
+        with open(path, "w") as f:
+            f.write(self.profiler.output_html())
+
+
+def get_profiler(name=None):
+    """Return a profiler instance, "sampling" requires pyinstrument."""
+    if name == SamplingProfiler.name and pyinstrument is not None:
+        return SamplingProfiler()
+    return CProfiler()
+
+
+def save(profiler, directory, prefix="request"):
+    """Store the profile in `directory`, returning the file path."""
+    filename = "{}-{}-{}.{}".format(prefix, int(time.time() * 1000), os.getpid(), profiler.extension)
+    path = os.path.join(directory, filename)
+    profiler.save(path)
+    return path
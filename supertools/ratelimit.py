@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+"""Request rate limiting.
+
+Rates are declared as strings like "100/m" (requests per second, minute,
+hour or day) and checked against a backend that answers how long the client
+has to wait before its next request is allowed (0 when it is allowed now).
+
+Two backends are provided:
+
+- `LocalBackend`: in-process token bucket, smooth refill, no shared state
+  between processes.
+- `CacheBackend`: fixed window counter on a django cache with atomic
+  increments, shared between processes when the cache is.
+"""
+
+from __future__ import absolute_import
+
+import collections
+import threading
+import time
+
+from django.core.cache import caches
+
+
+PERIODS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+Rate = collections.namedtuple("Rate", ["num", "period"])
+
+_rates = {}
+
+
+def parse_rate(rate):
+    """Parse a rate string like "100/m" into a `Rate`.
+
+    The period may carry a multiplier, "10/5m" means ten requests every
+    five minutes. Parsed values are memoized.
+    """
+    try:
+        return _rates[rate]
+    except KeyError:
+        pass
+
+    num, period = rate.split("/")
+    multiplier, unit = period[:-1], period[-1]
+    if unit not in PERIODS:
+        raise ValueError("Invalid rate period: {!r}".format(rate))
+
+    result = _rates[rate] = Rate(int(num), int(multiplier or 1) * PERIODS[unit])
+    return result
+
+
+def key_by_ip(request):
+    return request.META.get("REMOTE_ADDR", "")
+
+
+def key_by_user(request):
+    """Authenticated user primary key, falling back to the client ip."""
+    user = getattr(request, "user", None)
+    if user is not None and user.is_authenticated():
+        return "user:{}".format(user.pk)
+    return "ip:{}".format(key_by_ip(request))
+
+
+KEY_FUNCTIONS = {
+    "ip": key_by_ip,
+    "user": key_by_user,
+}
+
+
+class LocalBackend(object):
+    """In-process token bucket backend.
+
+    :param max_keys: Number of tracked keys above which buckets that have
+        refilled completely (equivalent to untracked ones) are discarded.
+    :param prune_interval: Minimum seconds between two prunings, so the
+        scan is not repeated on every request when many clients are active.
+    """
+
+    def __init__(self, max_keys=10000, prune_interval=60):
+        self.max_keys = max_keys
+        self.prune_interval = prune_interval
+        self._buckets = {}
+        self._last_prune = 0
+        self._lock = threading.Lock()
+
+    def consume(self, key, rate):
+        now = time.time()
+        refill = float(rate.num) / rate.period
+
+        with self._lock:
+            tokens, last, _ = self._buckets.get(key, (rate.num, now, rate))
+            tokens = min(rate.num, tokens + (now - last) * refill)
+
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now, rate)
+                wait = 0
+            else:
+                self._buckets[key] = (tokens, now, rate)
+                wait = (1 - tokens) / refill
+
+            if (len(self._buckets) > self.max_keys and
+                    now - self._last_prune >= self.prune_interval):
+                self._last_prune = now
+                self._prune(now)
+
+        return wait
+
+    def _prune(self, now):
+        for key, (tokens, last, rate) in list(self._buckets.items()):
+            if tokens + (now - last) * rate.num / float(rate.period) >= rate.num:
+                del self._buckets[key]
+
+
+class CacheBackend(object):
+    """Fixed window counter backend on top of a django cache.
+
+    :param alias: Django cache alias.
+    :param prefix: Prefix for cache keys.
+    """
+
+    def __init__(self, alias="default", prefix="ratelimit"):
+        self.alias = alias
+        self.prefix = prefix
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def consume(self, key, rate):
+        now = time.time()
+        window = int(now // rate.period)
+        cache_key = "{}:{}:{}:{}".format(self.prefix, key, rate.period, window)
+        cache = self.cache
+
+        if cache.add(cache_key, 1, rate.period + 1):
+            count = 1
+        else:
+            try:
+                count = cache.incr(cache_key)
+            except ValueError:
+                # Expired between add and incr.
+                cache.add(cache_key, 1, rate.period + 1)
+                count = 1
+
+        if count > rate.num:
+            return (window + 1) * rate.period - now
+        return 0
+
+
+default_backend = LocalBackend()
+
+
+def check(request, rate, key="ip", scope="", backend=None):
+    """Consume one request from the client bucket.
+
+    :param rate: Rate string ("100/m") or `Rate` instance.
+    :param key: "ip", "user" or a callable receiving the request.
+    :param scope: Namespace of the bucket (usually the view).
+    :param backend: Backend instance, `default_backend` when None.
+
+    :return: Seconds to wait until the next request is allowed, 0 if this one is.
+    """
+    if not isinstance(rate, Rate):
+        rate = parse_rate(rate)
+    if not callable(key):
+        key = KEY_FUNCTIONS[key]
+    if backend is None:
+        backend = default_backend
+    return backend.consume("{}:{}".format(scope, key(request)), rate)
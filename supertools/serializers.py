@@ -7,23 +7,47 @@ data, for example, as json, html and others.
 
 from __future__ import absolute_import
 
+import csv
+import datetime
+import itertools
 import json
+import logging
+import operator
+from collections import OrderedDict
 
 from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models.query import QuerySet
 from django.template.loader import get_template
 from django.utils import six
+from django.utils import timezone
+from django.utils.encoding import force_text
+from django.utils.functional import Promise
 from django.utils.functional import cached_property
 
+from . import exceptions as exc
+from . import uploads
+from .dates import datetime_to_ecma262
 from .json import LazyEncoder
 
 
+logger = logging.getLogger(__name__)
+
+
 def get_request_encoding(request):
     return getattr(request, "encoding", None) or settings.DEFAULT_CHARSET
 
 
+def get_media_type(content_type):
+    """Media type of a Content-Type value, without parameters."""
+    return content_type.split(";", 1)[0].strip().lower()
+
+
 def merge_dict(a, b):
     #NOTE: In future python 3.5 (PEP 476) -> z = {**x, **y}
-    return a.copy().update(b)
+    result = a.copy()
+    result.update(b)
+    return result
 
 
 class SerializersContainer(object):
@@ -49,6 +73,12 @@ class SerializersContainer(object):
     def get_default(self) :
         return self.default_serializer
 
+    def get_by_format(self, format):
+        for serializer in self.serializers:
+            if serializer.format == format:
+                return serializer
+        return None
+
     def get_default_content_type(self):
         return self.get_default().content_type
 
@@ -71,6 +101,13 @@ class Serializer(object):
     """
     content_type = None
 
+    # Short name used to select the serializer with `ApiMixin.format_query_param`.
+    format = None
+
+    # When true, `dumps` returns an iterator of bytes chunks that should be
+    # sent using a streaming response instead of being buffered.
+    streaming = False
+
     def loads(self, data=None, request=None):
         raise NotImplementedError
 
@@ -84,6 +121,7 @@ class Serializer(object):
 class Json(Serializer):
     """Transform between json-encoded text and python built-in data types."""
     content_type = "application/json"
+    format = "json"
 
     def loads(self, request, data=None):
         if data is None:
@@ -102,47 +140,611 @@ class Json(Serializer):
             get_request_encoding(request))
 
     def accepts_content_type(self, content_type):
-        return self.content_type in content_type or "+json" in content_type
+        media_type = get_media_type(content_type)
+        return media_type == self.content_type or media_type.endswith("+json")
 
 
 class MultiPart(Serializer):
-    """Allow multipart requests. This serializer only serves for request decoding."""
+    """Allow multipart requests. This serializer only serves for request decoding.
+
+    File parts are streamed to a sink through `uploads.StreamingFileUploadHandler`
+    with per part size limits and checksums. `max_size` rejects the whole
+    request from its Content-Length before reading the body.
+
+    The handlers can only be installed while the body is still unparsed:
+    anything reading `request.POST` or `request.FILES` earlier (like
+    `middlewate.merge_data.RequestMergeDataMiddleware`) disables them, and a
+    warning is logged when that happens.
+    """
     content_type = "multipart/form-data"
 
+    def __init__(self, max_size=None, **handler_options):
+        self.max_size = max_size
+        self.handler_options = handler_options
+
+    def get_upload_handlers(self, request):
+        return [uploads.StreamingFileUploadHandler(request, **self.handler_options)]
+
     def loads(self, request, data=None):
+        if self.max_size is not None:
+            try:
+                content_length = int(request.META.get("CONTENT_LENGTH") or 0)
+            except ValueError:
+                content_length = 0
+            if content_length > self.max_size:
+                raise exc.RequestEntityTooLarge()
+
+        # Upload handlers can only be replaced before the body is parsed.
+        if hasattr(request, "_files"):
+            logger.warning("Multipart body of %s already parsed, streaming upload "
+                           "handlers (size limits, checksums) not applied.", request.path)
+        else:
+            request.upload_handlers = self.get_upload_handlers(request)
+
         return merge_dict(request.POST, request.FILES)
 
     def accepts_content_type(self, content_type):
         return self.content_type in content_type
 
 
-class PrettyJson(Json):
+class NdJson(Serializer):
+    """Transform between newline delimited json (json lines) and python iterables.
+
+    Both directions are incremental: `dumps` yields one encoded line per
+    record and `loads` returns a generator that parses the request body line
+    by line, so memory usage does not depend on the number of records.
+    """
+    content_type = "application/x-ndjson"
+    format = "ndjson"
+    streaming = True
+
+    def loads(self, request, data=None):
+        encoding = get_request_encoding(request)
+        if data is None:
+            lines = iter(request.readline, b"")
+        else:
+            lines = data.splitlines()
+        return self._iter_loads(lines, encoding)
+
+    def _iter_loads(self, lines, encoding):
+        for line in lines:
+            if isinstance(line, six.binary_type):
+                line = line.decode(encoding)
+            line = line.strip()
+            if line:
+                yield json.loads(line)
 
     def dumps(self, data, request=None, response=None):
-        return json.dumps(data, cls=LazyEncoder, indent=4, sort_keys=True)
+        encoding = get_request_encoding(request)
+        if data is None:
+            data = ()
+        elif isinstance(data, six.binary_type):
+            data = (data.decode(encoding),)
+        elif isinstance(data, six.string_types + (dict, Promise)):
+            data = (data,)
+        elif isinstance(data, QuerySet):
+            # Do not fill the queryset result cache with every row.
+            data = data.iterator()
+
+        encoder = LazyEncoder(ensure_ascii=False)
+        for record in data:
+            yield (encoder.encode(record) + "\n").encode(encoding)
+
+    def accepts_content_type(self, content_type):
+        return get_media_type(content_type) in (self.content_type, "application/jsonl")
+
+
+class _EchoBuffer(object):
+    """File-like object that returns what is written instead of storing it."""
+
+    def write(self, value):
+        return value
+
+
+class Csv(Serializer):
+    """Transform tabular data to comma separated values. This serializer only
+    serves for response encoding.
+
+    Rows can be dicts, sequences or model instances, coming from a list, any
+    iterable or a QuerySet. Rows are written one at a time, so memory usage
+    does not depend on the number of rows.
+
+    :param columns: Column names, in output order. By default they are taken
+        from the model concrete fields for QuerySets and from the sorted keys
+        of the first row for dicts.
+    :param header: Whether to write a first row with the column names.
+    """
+    content_type = "text/csv"
+    format = "csv"
+    streaming = True
+
+    def __init__(self, columns=None, header=True):
+        self.columns = columns
+        self.header = header
+
+    def format_value(self, value):
+        if value is None:
+            value = ""
+        elif isinstance(value, Promise):
+            value = force_text(value)
+        elif isinstance(value, datetime.datetime):
+            if timezone.is_aware(value):
+                value = timezone.localtime(value)
+            value = datetime_to_ecma262(value)
+        elif isinstance(value, (datetime.date, datetime.time)):
+            value = value.isoformat()
+
+        if six.PY2 and isinstance(value, six.text_type):
+            value = value.encode("utf-8")
+        return value
+
+    def get_rows(self, data):
+        """Return the column names and an iterator of value sequences.
+
+        A dict is a one row table and a string a one cell table. The type of
+        the rows is checked on the first one, raising `TypeError` for values
+        that are not dicts, sequences or model instances.
+        """
+        columns = self.columns
+
+        if isinstance(data, QuerySet):
+            if columns is None:
+                columns = [f.attname for f in data.model._meta.concrete_fields]
+            return columns, data.values_list(*columns).iterator()
+
+        if isinstance(data, dict):
+            data = (data,)
+        elif isinstance(data, six.string_types + (six.binary_type, Promise)):
+            data = ((data,),)
+
+        rows = iter(data)
+        try:
+            first = next(rows)
+        except StopIteration:
+            return columns or (), iter(())
+
+        if isinstance(first, dict):
+            if columns is None:
+                columns = sorted(first.keys())
+            getter = lambda row: [row.get(c) for c in columns]
+        elif isinstance(first, (list, tuple)):
+            getter = lambda row: row
+        elif hasattr(first, "_meta"):
+            if columns is None:
+                columns = [f.attname for f in first._meta.concrete_fields]
+            getter = lambda row: [getattr(row, c) for c in columns]
+        else:
+            raise TypeError("Csv rows must be dicts, sequences or model instances, "
+                            "not {}".format(type(first).__name__))
+
+        def iter_rows():
+            yield getter(first)
+            for row in rows:
+                yield getter(row)
+
+        return columns or (), iter_rows()
+
+    def dumps(self, data, request=None, response=None):
+        if data is None:
+            data = ()
+
+        # Rows are inspected before streaming so errors are raised before
+        # the response status is sent.
+        columns, rows = self.get_rows(data)
+        return self._iter_lines(columns, rows, get_request_encoding(request))
+
+    def _iter_lines(self, columns, rows, encoding):
+        writer = csv.writer(_EchoBuffer())
+        format_value = self.format_value
+
+        def encode(line):
+            if isinstance(line, six.text_type):
+                return line.encode(encoding)
+            return line
+
+        if self.header and columns:
+            yield encode(writer.writerow([format_value(c) for c in columns]))
+
+        for row in rows:
+            yield encode(writer.writerow([format_value(v) for v in row]))
+
+    def accepts_content_type(self, content_type):
+        return self.content_type in content_type
+
+
+class PrettyJson(Json):
+
+    def dumps(self, data, request=None, response=None, sort_keys=True):
+        return json.dumps(data, cls=LazyEncoder, indent=4, sort_keys=sort_keys)
+
+
+class _Truncator(object):
+    """Copy of a data structure bounded in items per container and total nodes."""
+
+    def __init__(self, max_items, max_nodes):
+        self.max_items = max_items
+        self.max_nodes = max_nodes
+        self.nodes = 0
+        self.truncated = False
+        # Set when a dict with non string keys gets the "..." key, which
+        # cannot be sorted with them.
+        self.mixed_keys = False
+
+    def marker(self, remaining=None):
+        self.truncated = True
+        if remaining is None:
+            return "... truncated"
+        return "... {} more items truncated".format(remaining)
+
+    def __call__(self, data):
+        self.nodes += 1
+
+        if isinstance(data, dict):
+            if self.nodes > self.max_nodes:
+                return self.marker(len(data))
+            result = {}
+            for index, (key, value) in enumerate(six.iteritems(data)):
+                if index >= self.max_items:
+                    if not all(isinstance(k, six.string_types) for k in result):
+                        self.mixed_keys = True
+                    result["..."] = self.marker(len(data) - index)
+                    break
+                result[key] = self(value)
+            return result
+
+        if isinstance(data, (list, tuple)):
+            if self.nodes > self.max_nodes:
+                return [self.marker(len(data))]
+            result = [self(value) for value in data[:self.max_items]]
+            if len(data) > self.max_items:
+                result.append(self.marker(len(data) - self.max_items))
+            return result
+
+        if (hasattr(data, "__iter__") and
+                not isinstance(data, six.string_types + (six.binary_type, Promise))):
+            # Generators, querysets and other lazy iterables: consume at most
+            # max_items + 1 elements to know whether they are truncated.
+            items = list(itertools.islice(data, self.max_items + 1))
+            if self.nodes > self.max_nodes:
+                return [self.marker()]
+            result = [self(value) for value in items[:self.max_items]]
+            if len(items) > self.max_items:
+                result.append(self.marker())
+            return result
+
+        return data
 
 
 class HtmlJson(Serializer):
-    """Transform between html-encoded json text and python built-in data types."""
+    """Transform between html-encoded json text and python built-in data types.
+
+    The rendered document is bounded so browsing a big endpoint stays cheap:
+    containers are cut to `max_items` elements, at most `max_nodes` values are
+    visited, keys are only sorted below `sort_keys_max_nodes` values and the
+    json text is cut to `max_length` characters. When something is truncated
+    the template receives `truncated`; `raw_url` links to the full
+    representation as plain json when the view allows selecting the format
+    from the query string.
+    """
 
     content_type = "text/html"
+    format = "api"
     template_name = "http/api.html"
+    max_items = 100
+    max_nodes = 10000
+    max_length = 512 * 1024
+    sort_keys_max_nodes = 2000
 
-    def __init__(self, template_name=None):
+    def __init__(self, template_name=None, max_items=None, max_nodes=None,
+                 max_length=None, sort_keys_max_nodes=None):
         if template_name:
             self.template_name = template_name
+        if max_items is not None:
+            self.max_items = max_items
+        if max_nodes is not None:
+            self.max_nodes = max_nodes
+        if max_length is not None:
+            self.max_length = max_length
+        if sort_keys_max_nodes is not None:
+            self.sort_keys_max_nodes = sort_keys_max_nodes
         self.json = PrettyJson()
 
     @cached_property
     def template(self):
         return get_template(self.template_name)
 
+    def get_raw_url(self, request):
+        """
+        Url of the same resource represented as plain json, only available
+        when the view enables `ApiMixin.format_query_param`.
+        """
+        format_query_param = getattr(request, "format_query_param", None)
+        if format_query_param is None:
+            return None
+
+        params = request.GET.copy()
+        params[format_query_param] = Json.format
+        return "{}?{}".format(request.path, params.urlencode())
+
     def dumps(self, data, request=None, response=None):
+        truncator = _Truncator(self.max_items, self.max_nodes)
+        data = truncator(data)
+        sort_keys = truncator.nodes <= self.sort_keys_max_nodes and not truncator.mixed_keys
+
+        text = self.json.dumps(data, request, response, sort_keys=sort_keys)
+        truncated = truncator.truncated
+        if len(text) > self.max_length:
+            text = text[:self.max_length] + "\n... truncated"
+            truncated = True
+
         return self.template.render({
-            "data": self.json.dumps(data, request, response),
+            "data": text,
+            "truncated": truncated,
+            "raw_url": self.get_raw_url(request),
             "request": request,
             "response": response
         })
 
     def accepts_content_type(self, content_type):
         return self.content_type in content_type
+
+
+# Model serializers
+#
+# Declarative transformation of model instances (and querysets) into python
+# built-in data types, ready to be handed to `http.Ok` and encoded by any of
+# the media type serializers above.
+
+class Field(object):
+    """Model attribute exposed by a `ModelSerializer`.
+
+    :param source: Attribute path using django lookup notation (`author__name`).
+        Defaults to the name the field is declared with.
+    """
+    creation_counter = 0
+
+    def __init__(self, source=None):
+        self.source = source
+        self.creation_counter = Field.creation_counter
+        Field.creation_counter += 1
+
+
+class MethodField(Field):
+    """Computed value obtained calling `get_<name>(obj)` on the serializer.
+
+    :param method_name: Name of the serializer method. Defaults to `get_<name>`.
+    :param select_related: Relations the method traverses (single valued).
+    :param prefetch_related: Relations the method traverses (multi valued).
+    """
+    def __init__(self, method_name=None, select_related=(), prefetch_related=()):
+        super(MethodField, self).__init__()
+        self.method_name = method_name
+        self.select_related = tuple(select_related)
+        self.prefetch_related = tuple(prefetch_related)
+
+
+def _compile_path_accessor(attrs, many_indexes=()):
+    """Build a function that resolves a chain of attributes on an object.
+
+    Intermediate `None` values short-circuit to `None` instead of raising
+    `AttributeError`. Attributes at `many_indexes` positions are related
+    managers, and the rest of the chain is applied to each of their objects.
+    """
+    if many_indexes:
+        index = many_indexes[0]
+        head = _compile_path_accessor(attrs[:index + 1])
+        tail = attrs[index + 1:]
+        if not tail:
+            return lambda obj: [o.pk for o in head(obj).all()]
+        tail_accessor = _compile_path_accessor(
+            tail, [i - index - 1 for i in many_indexes[1:]])
+
+        def accessor(obj):
+            manager = head(obj)
+            if manager is None:
+                return []
+            return [tail_accessor(o) for o in manager.all()]
+        return accessor
+
+    if len(attrs) == 1:
+        return operator.attrgetter(attrs[0])
+
+    def accessor(obj):
+        for attr in attrs:
+            if obj is None:
+                return None
+            obj = getattr(obj, attr)
+        return obj
+    return accessor
+
+
+class _Plan(object):
+    """Precompiled serialization plan for a serializer class and model."""
+
+    __slots__ = ("names", "accessors", "method_fields", "values_lookups",
+                 "select_related", "prefetch_related")
+
+    def __init__(self, serializer_cls, model):
+        self.names = []
+        self.accessors = []
+        self.method_fields = []
+        self.values_lookups = []
+        values_allowed = True
+        select_related = set()
+        prefetch_related = set()
+
+        for name, field in serializer_cls._declared_fields.items():
+            self.names.append(name)
+
+            if isinstance(field, MethodField):
+                self.accessors.append(None)
+                self.method_fields.append((name, field.method_name or "get_{}".format(name)))
+                select_related.update(field.select_related)
+                prefetch_related.update(field.prefetch_related)
+                continue
+
+            lookups = (field.source or name).split("__")
+            attrs, many_indexes, relations, resolved = self._resolve(model, lookups)
+            self.accessors.append(_compile_path_accessor(attrs, many_indexes))
+            self.values_lookups.append("__".join(lookups))
+
+            if relations:
+                if not many_indexes:
+                    select_related.add("__".join(relations))
+                else:
+                    prefetch_related.add("__".join(relations))
+            if many_indexes or not resolved:
+                values_allowed = False
+
+        if self.method_fields or not values_allowed:
+            self.values_lookups = None
+
+        self.select_related = tuple(sorted(select_related))
+        self.prefetch_related = tuple(sorted(prefetch_related))
+
+    @staticmethod
+    def _resolve(model, lookups):
+        """Translate django lookups to attribute names using model metadata.
+
+        Returns the attribute chain, the positions of multi valued relations,
+        the traversed relations (by attribute name, as `prefetch_related`
+        expects for reverse relations) and whether the whole path resolves to
+        database fields (so it can be read with `values_list`).
+        """
+        attrs = list(lookups)
+        many_indexes = []
+        relations = []
+        resolved = False
+
+        for index, lookup in enumerate(lookups):
+            is_last = index == len(lookups) - 1
+            if model is None:
+                break
+            if lookup == "pk":
+                resolved = is_last
+                break
+            try:
+                field = model._meta.get_field(lookup)
+            except FieldDoesNotExist:
+                # Plain python attribute or property, nothing to optimize.
+                break
+
+            if not field.is_relation:
+                resolved = is_last and field.concrete
+                break
+
+            resolved = is_last
+            if field.many_to_many or field.one_to_many:
+                many_indexes.append(index)
+                if not field.concrete:
+                    attrs[index] = field.get_accessor_name()
+                relations.append(attrs[index])
+            elif is_last:
+                # Serialize forward relations by primary key, as values_list does.
+                if field.concrete:
+                    attrs[index] = field.attname
+                else:
+                    attrs[index] = field.get_accessor_name()
+                    attrs.append("pk")
+                    relations.append(attrs[index])
+            else:
+                if not field.concrete:
+                    attrs[index] = field.get_accessor_name()
+                relations.append(attrs[index])
+
+            model = field.related_model
+
+        return attrs, many_indexes, relations, resolved
+
+
+class ModelSerializerMetaclass(type):
+    def __new__(mcs, name, bases, attrs):
+        declared = [(key, attrs.pop(key)) for key, value in list(attrs.items())
+                    if isinstance(value, Field)]
+        declared.sort(key=lambda item: item[1].creation_counter)
+
+        cls = super(ModelSerializerMetaclass, mcs).__new__(mcs, name, bases, attrs)
+
+        fields = OrderedDict()
+        for base in reversed(cls.__mro__[1:]):
+            fields.update(getattr(base, "_declared_fields", {}))
+        for field_name in attrs.get("fields", ()):
+            fields[field_name] = Field()
+        fields.update(declared)
+
+        cls._declared_fields = fields
+        cls._plans = {}
+        return cls
+
+
+class ModelSerializer(six.with_metaclass(ModelSerializerMetaclass, object)):
+    """Declarative model to dict serializer.
+
+    Field accessors are compiled once per serializer class and model, the
+    `select_related`/`prefetch_related` needed to avoid N+1 queries are derived
+    from the declared fields, and querysets are read with `values_list` when
+    no computed fields are declared, skipping model instantiation.
+
+    Example::
+
+        class ArticleSerializer(ModelSerializer):
+            model = Article
+            fields = ("id", "title")
+            author = Field("author__username")
+            tags = Field("tags__name")
+            url = MethodField()
+
+            def get_url(self, obj):
+                return obj.get_absolute_url()
+
+        return http.Ok(ArticleSerializer().serialize_many(Article.objects.all()))
+    """
+    model = None
+    fields = ()
+
+    def get_plan(self, model=None):
+        model = self.model or model
+        try:
+            return self._plans[model]
+        except KeyError:
+            plan = self._plans[model] = _Plan(type(self), model)
+            return plan
+
+    def _bound_accessors(self, plan):
+        methods = dict((name, getattr(self, method_name))
+                       for name, method_name in plan.method_fields)
+        return [(name, accessor or methods[name])
+                for name, accessor in zip(plan.names, plan.accessors)]
+
+    def prepare_queryset(self, queryset):
+        """Apply the related lookups needed by the declared fields."""
+        plan = self.get_plan(queryset.model)
+        if plan.select_related:
+            queryset = queryset.select_related(*plan.select_related)
+        if plan.prefetch_related:
+            queryset = queryset.prefetch_related(*plan.prefetch_related)
+        return queryset
+
+    def serialize(self, obj):
+        accessors = self._bound_accessors(self.get_plan(type(obj)))
+        return dict((name, accessor(obj)) for name, accessor in accessors)
+
+    def iter_serialize(self, objects):
+        """Lazily serialize a queryset or any iterable of model instances."""
+        if isinstance(objects, QuerySet):
+            plan = self.get_plan(objects.model)
+            if plan.values_lookups is not None and not getattr(objects, "_fields", None):
+                names = plan.names
+                for row in objects.values_list(*plan.values_lookups):
+                    yield dict(zip(names, row))
+                return
+            objects = self.prepare_queryset(objects)
+
+        accessors = None
+        for obj in objects:
+            if accessors is None:
+                accessors = self._bound_accessors(self.get_plan(type(obj)))
+            yield dict((name, accessor(obj)) for name, accessor in accessors)
+
+    def serialize_many(self, objects):
+        return list(self.iter_serialize(objects))
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""Upload handlers that stream multipart file parts out of the request.
+
+Django parses multipart bodies incrementally and hands each file chunk to the
+upload handlers installed in `request.upload_handlers`. The handler defined
+here writes chunks straight to a sink (a temporary file by default) while
+computing a checksum and enforcing a size limit per part, so oversized
+uploads are rejected as soon as the limit is crossed instead of after the
+whole body has been read.
+"""
+
+from __future__ import absolute_import
+
+import hashlib
+
+from django.conf import settings
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.core.files.uploadhandler import FileUploadHandler
+from django.utils.translation import ugettext_lazy as _
+
+from . import exceptions as exc
+
+
+UPLOAD_MAX_PART_SIZE = getattr(settings, "SUPERTOOLS_UPLOAD_MAX_PART_SIZE", None)
+UPLOAD_CHECKSUM_ALGORITHM = getattr(settings, "SUPERTOOLS_UPLOAD_CHECKSUM_ALGORITHM", "sha256")
+
+
+def temporary_file_sink(handler):
+    """Default sink: a `TemporaryUploadedFile` on disk."""
+    return TemporaryUploadedFile(handler.file_name, handler.content_type, 0,
+                                 handler.charset, handler.content_type_extra)
+
+
+class StreamingFileUploadHandler(FileUploadHandler):
+    """Write file parts to a sink computing their checksum on the fly.
+
+    :param max_part_size: Maximum size in bytes of each file part, `None` for
+        unlimited. Exceeding it raises `exceptions.RequestEntityTooLarge`.
+    :param checksum_algorithm: Any `hashlib` algorithm name, or `None` to skip
+        checksum calculation. The hex digest is available as `checksum` on
+        the resulting uploaded file.
+    :param sink: Callable receiving the handler (with `field_name`,
+        `file_name`, `content_type`...) and returning a writable file object
+        that is used as the uploaded file.
+    """
+
+    def __init__(self, request=None, max_part_size=UPLOAD_MAX_PART_SIZE,
+                 checksum_algorithm=UPLOAD_CHECKSUM_ALGORITHM, sink=temporary_file_sink):
+        super(StreamingFileUploadHandler, self).__init__(request)
+        self.max_part_size = max_part_size
+        self.checksum_algorithm = checksum_algorithm
+        self.sink = sink
+
+    def new_file(self, *args, **kwargs):
+        super(StreamingFileUploadHandler, self).new_file(*args, **kwargs)
+        if self.max_part_size is not None and (self.content_length or 0) > self.max_part_size:
+            raise exc.RequestEntityTooLarge(_("Uploaded file is too large"))
+
+        self.size = 0
+        self.hash = hashlib.new(self.checksum_algorithm) if self.checksum_algorithm else None
+        self.file = self.sink(self)
+
+    def receive_data_chunk(self, raw_data, start):
+        self.size += len(raw_data)
+        if self.max_part_size is not None and self.size > self.max_part_size:
+            self.file.close()
+            raise exc.RequestEntityTooLarge(_("Uploaded file is too large"))
+
+        if self.hash is not None:
+            self.hash.update(raw_data)
+        self.file.write(raw_data)
+
+    def file_complete(self, file_size):
+        self.file.seek(0)
+        self.file.size = file_size
+        self.file.checksum = self.hash.hexdigest() if self.hash is not None else None
+        return self.file
@@ -4,3 +4,4 @@ from .ajax import AjaxMixin
 from .api import ApiMixin
 from .forms import FormViewMixin
 from .paginator import PaginatorMixin
+from .events import EventStreamView
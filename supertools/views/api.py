@@ -1,12 +1,18 @@
 # -*- coding: utf-8 -*-
 from __future__ import absolute_import
 
+import hashlib
+import math
+import time
 import traceback
 import inspect
 
 from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse as DjangoHttpResponse
 from django.utils import six
 from django.utils.functional import Promise
+from django.utils.translation import ugettext_lazy as _
 from django.views.decorators.csrf import csrf_exempt
 
 from .. import json
@@ -14,11 +20,50 @@ from .. import http
 from .. import exceptions as exc
 from .. import serializers
 from .. import negotiation
+from .. import db
+from .base import set_retry_after
+
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS", "TRACE")
+
+FORMAT_QUERY_PARAM = getattr(settings, "SUPERTOOLS_FORMAT_QUERY_PARAM", None)
+
+IDEMPOTENCY_CACHE = getattr(settings, "SUPERTOOLS_IDEMPOTENCY_CACHE", "default")
+IDEMPOTENCY_TTL = getattr(settings, "SUPERTOOLS_IDEMPOTENCY_TTL", 24 * 3600)
+IDEMPOTENCY_LOCK_TIMEOUT = getattr(settings, "SUPERTOOLS_IDEMPOTENCY_LOCK_TIMEOUT", 60)
+IDEMPOTENCY_FINGERPRINT_MAX_SIZE = getattr(settings, "SUPERTOOLS_IDEMPOTENCY_FINGERPRINT_MAX_SIZE",
+                                           1024 * 1024)
+
+READ_REPLICA = getattr(settings, "SUPERTOOLS_READ_REPLICA", None)
+READ_REPLICA_STICKY_SECONDS = getattr(settings, "SUPERTOOLS_READ_REPLICA_STICKY_SECONDS", 10)
 
 
 class ApiMixin(object):
     serializers = None
 
+    # Query string parameter selecting a serializer by its `format` name,
+    # overriding the Accept header (e.g. "format"). Disabled when None.
+    format_query_param = FORMAT_QUERY_PARAM
+
+    # Responses to unsafe requests carrying an `Idempotency-Key` header are
+    # stored for `idempotency_ttl` seconds (None disables it) and replayed
+    # for retries of the same request instead of running the handler again.
+    # Reusing a key with a different payload is answered with 422.
+    idempotency_cache = IDEMPOTENCY_CACHE
+    idempotency_ttl = IDEMPOTENCY_TTL
+    idempotency_lock_timeout = IDEMPOTENCY_LOCK_TIMEOUT
+    idempotency_fingerprint_max_size = IDEMPOTENCY_FINGERPRINT_MAX_SIZE
+
+    # Safe requests read from the `read_replica` database alias (requires
+    # `db.ReplicaRouter` in DATABASE_ROUTERS) and unsafe ones from
+    # `primary_database`. After a write the client keeps reading from the
+    # primary for `replica_sticky_seconds`, tracked with a cookie, so it
+    # always sees its own writes.
+    read_replica = READ_REPLICA
+    primary_database = db.PRIMARY_DATABASE
+    replica_sticky_seconds = READ_REPLICA_STICKY_SECONDS
+    replica_sticky_cookie = "supertools_primary"
+
     def __init__(self, *args, **kwarg):
         super(ApiMixin, self).__init__(*args, **kwarg)
 
@@ -44,9 +89,139 @@ class ApiMixin(object):
 
     @csrf_exempt
     def dispatch(self, request, *args, **kwargs):
+        # Wrapped here so serialization is accounted and streamed content
+        # keeps the concurrency slot.
+        return self.run_dispatch(self.idempotent_dispatch, request, *args, **kwargs)
+
+    def idempotent_dispatch(self, request, *args, **kwargs):
+        idempotency_key = self.get_idempotency_key(request)
+        if idempotency_key is None:
+            return self.api_dispatch(request, *args, **kwargs)
+
+        cache = caches[self.idempotency_cache]
+        cache_key = "idempotency:{}".format(idempotency_key)
+        lock_key = "{}:lock".format(cache_key)
+
+        fingerprint = self.get_request_fingerprint(request)
+        stored = cache.get(cache_key)
+        if stored is not None:
+            if stored["fingerprint"] != fingerprint:
+                response = http.UnprocessableEntity(
+                    {"_message": _("Idempotency key reused with a different request")})
+                return self.serialize_response(
+                    response, self.serializers.get_default_content_type(), request)
+            return self.replay_response(stored)
+
+        if not cache.add(lock_key, 1, self.idempotency_lock_timeout):
+            # Same request still being processed.
+            response = http.Conflict({"_message": _("A request with the same idempotency key is in progress")})
+            return self.serialize_response(
+                response, self.serializers.get_default_content_type(), request)
+
+        try:
+            response = self.api_dispatch(request, *args, **kwargs)
+            # Throttled and failed requests are meant to be retried.
+            if (not response.streaming and
+                    not http.is_server_error(response.status_code) and
+                    response.status_code != http.HTTP_429_TOO_MANY_REQUESTS):
+                cache.set(cache_key, {
+                    "fingerprint": fingerprint,
+                    "content": response.content,
+                    "status": response.status_code,
+                    "headers": list(response.items()),
+                    "cookies": response.cookies,
+                }, self.idempotency_ttl)
+            return response
+        finally:
+            cache.delete(lock_key)
+
+    def get_idempotency_key(self, request):
+        """
+        Cache key fragment identifying a retried request, or None when
+        the request should not be deduplicated.
+        """
+        if self.idempotency_ttl is None or request.method in SAFE_METHODS:
+            return None
+
+        key = request.META.get("HTTP_IDEMPOTENCY_KEY")
+        if not key:
+            return None
+
+        user = getattr(request, "user", None)
+        if user is not None and user.is_authenticated():
+            client = "user:{}".format(user.pk)
+        else:
+            client = "ip:{}".format(request.META.get("REMOTE_ADDR", ""))
+
+        key = "{}:{}:{}:{}".format(client, request.method, request.path, key)
+        return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+    def get_request_fingerprint(self, request):
+        """
+        Hash of the request payload, to detect keys reused for a different
+        request. Bodies above `idempotency_fingerprint_max_size` (which would
+        have to be buffered, defeating streaming parsers) are identified by
+        their content type and length only.
+        """
+        content_type = request.META.get("CONTENT_TYPE", "")
+        try:
+            content_length = int(request.META.get("CONTENT_LENGTH") or 0)
+        except ValueError:
+            content_length = 0
+
+        if content_length > self.idempotency_fingerprint_max_size:
+            payload = "{}:{}".format(content_type, content_length).encode("utf-8")
+        else:
+            payload = content_type.encode("utf-8") + b":" + request.body
+        return hashlib.sha1(payload).hexdigest()
+
+    def replay_response(self, stored):
+        response = DjangoHttpResponse(stored["content"], status=stored["status"])
+        for header, value in stored["headers"]:
+            response[header] = value
+        response.cookies = stored["cookies"]
+        response["Idempotent-Replayed"] = "true"
+        return response
+
+    def get_read_database(self, request):
+        if self.read_replica is None or request.method not in SAFE_METHODS:
+            return self.primary_database
+
+        try:
+            sticky_until = float(request.COOKIES.get(self.replica_sticky_cookie, 0))
+        except ValueError:
+            sticky_until = 0
+
+        if sticky_until > time.time():
+            return self.primary_database
+        return self.read_replica
+
+    def api_dispatch(self, request, *args, **kwargs):
+        if self.read_replica is None:
+            return self.negotiated_dispatch(request, *args, **kwargs)
+
+        alias = self.get_read_database(request)
+        with db.use_database(alias):
+            response = self.negotiated_dispatch(request, *args, **kwargs)
+
+        if response.streaming and not isinstance(response, http.FileResponse):
+            # Streamed content is generated after the view returned.
+            response.streaming_content = db.iter_using_database(response.streaming_content, alias)
+
+        if request.method not in SAFE_METHODS and not http.is_server_error(response.status_code):
+            sticky_until = time.time() + self.replica_sticky_seconds
+            response.set_cookie(self.replica_sticky_cookie, str(int(math.ceil(sticky_until))),
+                                max_age=self.replica_sticky_seconds, httponly=True)
+        return response
+
+    def negotiated_dispatch(self, request, *args, **kwargs):
         response_content_type = self.serializers.get_default_content_type()
 
         try:
+            # Rejected before paying for body parsing.
+            self.check_rate_limit(request)
+            self.acquire_slot()
+
             content_type = request.META.get("CONTENT_TYPE", response_content_type)
             content_length = request.META.get("CONTENT_LENGTH", "")
 
@@ -57,23 +232,53 @@ class ApiMixin(object):
                 else:
                     request.data = content_type_serializer.loads(request)
 
-            media_types = negotiation.parse_media_range(request.META.get("HTTP_ACCEPT", "*/*"))
-            serializers_media_range = ",".join(s.content_type for s in self.serializers)
-            serializers_media_types = negotiation.parse_media_range(serializers_media_range)
-            media_type = negotiation.intersect_media_types(media_types, serializers_media_types)
-            if media_type is None:
-                raise exceptions.NotAcceptable()
-
-            response_content_type = str(media_type)
+            request.format_query_param = self.format_query_param
+            format = self.format_query_param and request.GET.get(self.format_query_param)
+            if format:
+                format_serializer = self.serializers.get_by_format(format)
+                if format_serializer is None:
+                    raise exc.NotAcceptable()
+                response_content_type = format_serializer.content_type
+            else:
+                negotiator = negotiation.get_negotiator(
+                    negotiation.MediaTypeNegotiator,
+                    [s.content_type for s in self.serializers])
+                selected = negotiator.select(request.META.get("HTTP_ACCEPT"))
+                if selected is None:
+                    raise exc.NotAcceptable()
+                response_content_type = selected
             response = super(ApiMixin, self).dispatch(request, *args, **kwargs)
         except exc.BaseException as e:
             if isinstance(e.content, six.string_types + (Promise,)):
                 response = e.response_class({"_message": e.content})
             else:
                 response = e.response_class(e.content)
+            set_retry_after(response, getattr(e, "retry_after", None))
+
+        return self.serialize_response(response, response_content_type, request)
 
-        serializer = self.serializers.get_by_content_type(response_content_type)
+    def serialize_response(self, response, content_type, request):
+        serializer = self.serializers.get_by_content_type(content_type)
         if isinstance(response, http.HttpResponse):
-            response.content = serializer.dumps(response.content_data, request, response)
+            if serializer.streaming:
+                response = self.make_streaming_response(serializer, response, request)
+            else:
+                response.content = serializer.dumps(response.content_data, request, response)
+                response["Content-Type"] = serializer.content_type
 
         return response
+
+    def make_streaming_response(self, serializer, response, request):
+        """
+        Replace a buffered response with a streaming one, preserving its
+        status code and headers, whose content is generated by the serializer.
+        """
+        streaming_response = http.StreamingHttpResponse(
+            serializer.dumps(response.content_data, request, response),
+            status=response.status_code)
+
+        for header, value in response.items():
+            streaming_response[header] = value
+        streaming_response.cookies = response.cookies
+        streaming_response["Content-Type"] = serializer.content_type
+        return streaming_response
@@ -1,11 +1,31 @@
 from __future__ import absolute_import
 
+import logging
+import math
+
+from django.conf import settings
 from django.core.urlresolvers import reverse
 from django.views.generic import View as DjangoView
 from django.template.loader import render_to_string, get_template
 
 from .. import http
 from .. import exceptions as exc
+from .. import ratelimit
+from .. import admission
+from .. import permissions as perms
+from .. import instrumentation
+from .. import profiling
+from .. import files
+from .. import serializers
+
+
+logger = logging.getLogger(__name__)
+
+
+def set_retry_after(response, seconds):
+    if seconds is not None:
+        response["Retry-After"] = str(int(math.ceil(seconds)))
+    return response
 
 
 class View(DjangoView):
@@ -13,6 +33,38 @@ class View(DjangoView):
     content_type = "text/html"
     permissions = ()
 
+    # Rate limit ("100/m"), client key ("ip", "user" or a function receiving
+    # the request) and backend instance (`ratelimit.default_backend` when None).
+    rate_limit = None
+    rate_limit_key = "ip"
+    rate_limit_backend = None
+
+    # Admission control: maximum requests in flight per process for this
+    # view (or for every view sharing `concurrency_group`), seconds to wait
+    # for a free slot and Retry-After sent when the request is shed.
+    max_in_flight = None
+    concurrency_group = None
+    concurrency_timeout = 0
+    concurrency_retry_after = 1
+
+    # Query instrumentation: when enabled (or when a `max_queries` budget is
+    # declared) query count, time and repeated statements are reported in
+    # response headers and to `report_query_stats`. Exceeding the budget
+    # raises `QueryBudgetExceeded` when SUPERTOOLS_QUERY_BUDGET_STRICT is set
+    # (meant for test settings) and logs a warning otherwise. Streaming
+    # responses run most of their queries after the headers are sent, so they
+    # get no headers; their queries are checked against the budget once the
+    # content has been streamed.
+    instrument_queries = getattr(settings, "SUPERTOOLS_INSTRUMENT_QUERIES", False)
+    max_queries = None
+
+    # On demand profiling (requires SUPERTOOLS_PROFILER_ENABLED): requests
+    # with the `profile_param` query parameter or the X-Profile header, by
+    # users allowed by `can_profile`, are profiled ("cprofile" or "sampling").
+    # The profile replaces the response, rendered with `serializers.HtmlJson`,
+    # or is stored in SUPERTOOLS_PROFILER_DIR when it is set.
+    profile_param = "_profile"
+
     def handle_exception(self, e):
         """
         Ad-hoc exception handling for all derived views.
@@ -25,8 +77,77 @@ class View(DjangoView):
             return e.response_class(e.content)
         elif isinstance(e, exc.MethodNotAllowed):
             return e.response_class(headers={"Allow": e.content})
+        elif isinstance(e, (exc.TooManyRequests, exc.ServiceUnavailable)):
+            return set_retry_after(e.response_class(e.content), e.retry_after)
         return e
 
+    def get_rate_limit_key(self):
+        """
+        Declared `rate_limit_key`, without binding it when it is a function.
+        """
+        if "rate_limit_key" in self.__dict__:
+            return self.__dict__["rate_limit_key"]
+        for cls in type(self).__mro__:
+            if "rate_limit_key" in cls.__dict__:
+                key = cls.__dict__["rate_limit_key"]
+                return key.__func__ if isinstance(key, staticmethod) else key
+
+    def check_rate_limit(self, request):
+        """
+        Consume one request of the client rate limit, raising
+        `TooManyRequests` when it is exhausted. Only checked once per request.
+        """
+        if self.rate_limit is None or getattr(self, "_rate_limit_checked", False):
+            return
+        self._rate_limit_checked = True
+
+        cls = type(self)
+        scope = "{}.{}".format(cls.__module__, cls.__name__)
+        wait = ratelimit.check(request, self.rate_limit, self.get_rate_limit_key(),
+                               scope, self.rate_limit_backend)
+        if wait:
+            raise exc.TooManyRequests(retry_after=wait)
+
+    def get_concurrency_limiter(self):
+        if self.max_in_flight is None:
+            return None
+
+        name = self.concurrency_group
+        if name is None:
+            cls = type(self)
+            name = "{}.{}".format(cls.__module__, cls.__name__)
+        return admission.get_limiter(name, self.max_in_flight)
+
+    def acquire_slot(self):
+        """
+        Take a slot of the concurrency limiter, raising `ServiceUnavailable`
+        when none is free in time. Only attempted once per request; the slot
+        is released by `run_dispatch`.
+        """
+        if getattr(self, "_slot_checked", False):
+            return
+        self._slot_checked = True
+
+        limiter = self.get_concurrency_limiter()
+        if limiter is None:
+            return
+        if not limiter.acquire(self.concurrency_timeout):
+            raise exc.ServiceUnavailable(retry_after=self.concurrency_retry_after)
+        self._slot = admission.Slot(limiter)
+
+    def release_slot(self, response=None):
+        """
+        Release the concurrency slot, or defer it until a streaming response
+        has been sent (responses are closed by the handler when done).
+        """
+        slot = self.__dict__.pop("_slot", None)
+        if slot is None:
+            return
+        if response is not None and response.streaming:
+            response._closable_objects.append(slot)
+        else:
+            slot.release()
+
     def init(self, request, *args, **kwargs):
         pass
 
@@ -36,18 +157,117 @@ class View(DjangoView):
         return context
 
     def __handle_permissions(self):
-        for fn in self.permissions:
-            result = fn(self)
+        for fn in perms.sort_by_cost(self.permissions):
+            result = perms.evaluate(fn, self)
             if isinstance(result, http.HttpResponseBase):
                 return result
             elif result == False:
-                raise exc.PermissionDenied("Forbidden")
+                raise exc.Forbidden("Forbidden")
 
         if hasattr(self, "handle_permissions"):
             return self.handle_permissions()
 
+    def run_instrumented(self, fn, request, *args, **kwargs):
+        """
+        Call `fn` capturing its database queries, unless instrumentation is
+        disabled or an outer call is already capturing them.
+        """
+        if ((not self.instrument_queries and self.max_queries is None) or
+                getattr(self, "_instrumenting", False)):
+            return fn(request, *args, **kwargs)
+
+        self._instrumenting = True
+        with instrumentation.capture_queries() as stats:
+            response = fn(request, *args, **kwargs)
+
+        if response.streaming and not isinstance(response, http.FileResponse):
+            response.streaming_content = instrumentation.iter_captured(
+                response.streaming_content, stats, self.check_query_budget)
+        else:
+            self.report_query_stats(request, response, stats)
+        return response
+
+    def report_query_stats(self, request, response, stats):
+        response["X-Query-Count"] = str(stats.count)
+        response["X-Query-Time"] = "{:.3f}".format(stats.time * 1000)
+        response["X-Query-Duplicates"] = str(sum(stats.duplicates.values()))
+        self.check_query_budget(stats)
+
+    def check_query_budget(self, stats):
+        if self.max_queries is not None and stats.count > self.max_queries:
+            cls = type(self)
+            message = "{}.{} executed {} queries, budget is {}. Repeated: {}".format(
+                cls.__module__, cls.__name__, stats.count, self.max_queries, stats.duplicates)
+            if getattr(settings, "SUPERTOOLS_QUERY_BUDGET_STRICT", False):
+                raise instrumentation.QueryBudgetExceeded(message)
+            logger.warning(message)
+
+    def can_profile(self, request):
+        user = getattr(request, "user", None)
+        return user is not None and user.is_superuser
+
+    def get_profiler_name(self, request):
+        """Requested profiler name, or None when profiling was not requested."""
+        name = request.GET.get(self.profile_param) or request.META.get("HTTP_X_PROFILE")
+        if not name or not self.can_profile(request):
+            return None
+        return name
+
+    def run_profiled(self, fn, request, *args, **kwargs):
+        """
+        Call `fn` (instrumented) under a profiler when the request asks for it.
+        """
+        # Settings are read per request, so they can be changed at runtime.
+        enabled = getattr(settings, "SUPERTOOLS_PROFILER_ENABLED", False)
+        if not enabled or getattr(self, "_profiling", False):
+            return self.run_instrumented(fn, request, *args, **kwargs)
+
+        name = self.get_profiler_name(request)
+        if name is None:
+            return self.run_instrumented(fn, request, *args, **kwargs)
+
+        self._profiling = True
+        profiler = profiling.get_profiler(name)
+        profiler.start()
+        try:
+            response = self.run_instrumented(fn, request, *args, **kwargs)
+        finally:
+            profiler.stop()
+
+        profiler_dir = getattr(settings, "SUPERTOOLS_PROFILER_DIR", None)
+        if profiler_dir:
+            response["X-Profile-File"] = profiling.save(profiler, profiler_dir)
+            return response
+
+        renderer = serializers.HtmlJson()
+        content = renderer.dumps(profiler.get_data(), request, response)
+        return http.Ok(content, content_type=renderer.content_type)
+
+    def run_dispatch(self, fn, request, *args, **kwargs):
+        """
+        Outermost dispatch wrapper (shared with mixins overriding dispatch):
+        profiling, instrumentation and release of the concurrency slot.
+        """
+        if getattr(self, "_dispatching", False):
+            return fn(request, *args, **kwargs)
+        self._dispatching = True
+
+        try:
+            response = self.run_profiled(fn, request, *args, **kwargs)
+        except BaseException:
+            self.release_slot()
+            raise
+        self.release_slot(response)
+        return response
+
     def dispatch(self, request, *args, **kwargs):
+        return self.run_dispatch(self.handle_request, request, *args, **kwargs)
+
+    def handle_request(self, request, *args, **kwargs):
         try:
+            self.check_rate_limit(request)
+            self.acquire_slot()
+
             result = self.init(request, *args, **kwargs)
             if isinstance(result, http.HttpResponseBase):
                 return result
@@ -69,6 +289,16 @@ class View(DjangoView):
             url = reverse(reverseurl, args=args, kwargs=kwargs)
         return http.Redirect(url)
 
+    def serve_file(self, path, content_type=None, filename=None, as_attachment=False,
+                   offload=files.FILE_OFFLOAD):
+        """
+        File response helper supporting `Range`/`If-Range` requests, sent
+        with sendfile when possible or offloaded to the front server.
+        """
+        return files.file_response(self.request, path, content_type=content_type,
+                                   filename=filename, as_attachment=as_attachment,
+                                   offload=offload)
+
     def render(self, template=None, context=None, data=None,
                response_cls=None, content_type=None, status_code=None):
         output_data = data or b""
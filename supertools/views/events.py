@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+
+from .. import http
+from .. import events
+from .base import View
+
+
+class EventStreamView(View):
+    """
+    Server-Sent Events endpoint streaming the events published on
+    `channel` of `event_source` (see `supertools.events`), resuming after
+    the `Last-Event-ID` sent by reconnecting clients and sending a heartbeat
+    comment every `heartbeat_interval` seconds without events.
+    """
+    content_type = "text/event-stream"
+    event_source = None
+    channel = None
+    heartbeat_interval = 15
+    # Reconnection delay advised to clients, in milliseconds.
+    retry = None
+
+    def get_event_source(self):
+        if self.event_source is None:
+            raise ValueError("event_source attr must be a valid event source")
+        return self.event_source
+
+    def get_channel(self):
+        return self.channel
+
+    def get_last_event_id(self, request):
+        return request.META.get("HTTP_LAST_EVENT_ID") or request.GET.get("lastEventId")
+
+    def get_events(self, last_event_id):
+        """
+        Iterator of `events.Event` (or None for heartbeats). Override to
+        stream events from somewhere else than an event source.
+        """
+        return self.get_event_source().listen(self.get_channel(), last_event_id,
+                                              self.heartbeat_interval)
+
+    def stream(self, last_event_id):
+        if self.retry is not None:
+            yield "retry: {}\n\n".format(self.retry).encode("ascii")
+        else:
+            # Flush headers to the client right away.
+            yield events.HEARTBEAT
+
+        for event in self.get_events(last_event_id):
+            if event is None:
+                yield events.HEARTBEAT
+            else:
+                yield event.encode()
+
+    def get(self, request, *args, **kwargs):
+        response = http.StreamingHttpResponse(self.stream(self.get_last_event_id(request)),
+                                              content_type=self.content_type)
+        response["Cache-Control"] = "no-cache"
+        # Disable nginx proxy buffering.
+        response["X-Accel-Buffering"] = "no"
+        return response
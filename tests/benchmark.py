@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+"""Tiny timing helpers shared by the benchmark tests.
+
+Benchmarks print their timings (run pytest with -s to see them) and only
+assert generous bounds, so they stay stable on loaded machines.
+"""
+
+import timeit
+
+
+def best_of(fn, repeat=5, number=1):
+    """Best wall time in seconds of `number` calls of `fn`."""
+    return min(timeit.repeat(fn, repeat=repeat, number=number))
+
+
+def format_time(seconds):
+    if seconds < 1e-3:
+        return "{:.2f}us".format(seconds * 1e6)
+    return "{:.2f}ms".format(seconds * 1e3)
+
+
+def report(name, **timings):
+    print("\n{}: {}".format(name, ", ".join(
+        "{}={}".format(key, format_time(value)) for key, value in sorted(timings.items()))))
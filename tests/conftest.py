@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+
+import django
+from django.conf import settings
+
+
+def pytest_configure():
+    settings.configure(
+        DEBUG=False,
+        SECRET_KEY="supertools-tests",
+        DATABASES={
+            "default": {"ENGINE": "django.db.backends.sqlite3", "NAME": ":memory:"},
+            "replica": {"ENGINE": "django.db.backends.sqlite3", "NAME": ":memory:"},
+        },
+        DATABASE_ROUTERS=["supertools.db.ReplicaRouter"],
+        CACHES={
+            "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+        },
+        INSTALLED_APPS=[
+            "django.contrib.contenttypes",
+            "django.contrib.auth",
+            "tests",
+        ],
+        MIDDLEWARE=[],
+        TEMPLATES=[{
+            "BACKEND": "django.template.backends.django.DjangoTemplates",
+            "OPTIONS": {
+                "loaders": [("django.template.loaders.locmem.Loader", {
+                    "http/api.html": "{{ data }}",
+                })],
+            },
+        }],
+        ROOT_URLCONF="tests.urls",
+        USE_TZ=True,
+    )
+    django.setup()
+
+    from django.core.management import call_command
+    for alias in settings.DATABASES:
+        call_command("migrate", run_syncdb=True, database=alias, verbosity=0)
@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+
+from django.db import models
+
+
+class Author(models.Model):
+    name = models.CharField(max_length=100)
+
+
+class Tag(models.Model):
+    name = models.CharField(max_length=100)
+
+
+class Article(models.Model):
+    title = models.CharField(max_length=100)
+    author = models.ForeignKey(Author, null=True, on_delete=models.CASCADE)
+    tags = models.ManyToManyField(Tag)
+
+    @property
+    def upper_title(self):
+        return self.title.upper()
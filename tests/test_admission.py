@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+
+import json
+
+from django.test import RequestFactory, SimpleTestCase
+
+from supertools import admission
+from supertools import http
+from supertools import serializers
+from supertools.views import View, ApiMixin
+
+
+class SlowView(View):
+    max_in_flight = 1
+    concurrency_group = "tests.slow"
+
+    def get(self, request, *args, **kwargs):
+        return http.Ok("ok")
+
+
+class StreamingView(SlowView):
+    def get(self, request, *args, **kwargs):
+        return http.StreamingHttpResponse(iter([b"a", b"b"]))
+
+
+class SlowApiView(ApiMixin, SlowView):
+    serializers = [serializers.Json, serializers.NdJson]
+
+    def get(self, request, *args, **kwargs):
+        return http.Ok([{"id": 1}, {"id": 2}])
+
+
+class ConcurrencyLimiterTests(SimpleTestCase):
+    def test_acquire_and_release(self):
+        limiter = admission.ConcurrencyLimiter(1)
+        self.assertTrue(limiter.acquire())
+        self.assertFalse(limiter.acquire(timeout=0.01))
+        limiter.release()
+        self.assertTrue(limiter.acquire())
+
+
+class ViewAdmissionTests(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.limiter = admission.get_limiter("tests.slow", 1)
+
+    def tearDown(self):
+        self.assertEqual(self.limiter.in_flight, 0)
+
+    def test_sheds_with_503_when_saturated(self):
+        self.assertTrue(self.limiter.acquire())
+        try:
+            response = SlowView.as_view()(self.factory.get("/"))
+        finally:
+            self.limiter.release()
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "1")
+
+        self.assertEqual(SlowView.as_view()(self.factory.get("/")).status_code, 200)
+
+    def test_api_503_body_is_a_message(self):
+        self.assertTrue(self.limiter.acquire())
+        try:
+            response = SlowApiView.as_view()(self.factory.get("/"))
+        finally:
+            self.limiter.release()
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "1")
+        self.assertIn("_message", json.loads(response.content.decode()))
+
+    def test_streaming_keeps_slot_until_closed(self):
+        for view, accept in ((StreamingView, "*/*"), (SlowApiView, "application/x-ndjson")):
+            response = view.as_view()(self.factory.get("/", HTTP_ACCEPT=accept))
+            self.assertTrue(response.streaming)
+            self.assertEqual(self.limiter.in_flight, 1)
+            list(response.streaming_content)
+            response.close()
+            self.assertEqual(self.limiter.in_flight, 0)
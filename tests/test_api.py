@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+
+import json
+
+from django.test import RequestFactory, SimpleTestCase, TestCase
+
+from supertools import db
+from supertools import http
+from supertools import serializers
+from supertools.views import View, ApiMixin
+
+from .models import Author
+
+
+class ItemsView(ApiMixin, View):
+    serializers = [serializers.Json, serializers.Csv]
+
+    def get(self, request, *args, **kwargs):
+        return http.Ok([{"id": 1}])
+
+
+class FormatQueryParamTests(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def test_disabled_by_default(self):
+        response = ItemsView.as_view()(self.factory.get("/", {"format": "pdf"}))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content.decode()), [{"id": 1}])
+
+    def test_enabled_per_view(self):
+        view = ItemsView.as_view(format_query_param="format")
+        response = view(self.factory.get("/", {"format": "csv"}))
+        self.assertEqual(b"".join(response.streaming_content), b"id\r\n1\r\n")
+        self.assertEqual(view(self.factory.get("/", {"format": "pdf"})).status_code, 406)
+
+
+class AuthorsView(ApiMixin, View):
+    serializers = [serializers.NdJson, serializers.Json]
+    read_replica = "replica"
+
+    def get(self, request, *args, **kwargs):
+        return http.Ok(Author.objects.values_list("name", flat=True))
+
+    def post(self, request, *args, **kwargs):
+        return http.Ok(Author.objects.values_list("name", flat=True))
+
+
+class ReadReplicaTests(TestCase):
+    multi_db = True
+
+    def setUp(self):
+        Author.objects.using("default").create(name="primary")
+        Author.objects.using("replica").create(name="replica")
+        self.factory = RequestFactory()
+
+    def stream(self, request):
+        response = AuthorsView.as_view()(request)
+        return [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+
+    def test_streamed_content_reads_the_pinned_database(self):
+        self.assertEqual(self.stream(self.factory.get("/")), ["replica"])
+        self.assertEqual(self.stream(self.factory.post("/", "{}", content_type="application/json",
+                                                        HTTP_ACCEPT="application/x-ndjson")), ["primary"])
+
+    def test_writes_go_to_the_primary(self):
+        with db.use_database("replica"):
+            author = Author.objects.get()
+            author.name = "changed"
+            author.save()
+
+        self.assertEqual(Author.objects.using("replica").get().name, "replica")
+        self.assertTrue(Author.objects.using("default").filter(name="changed").exists())
+
+
+class NegotiationTests(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def test_not_acceptable(self):
+        response = ItemsView.as_view()(self.factory.get("/", HTTP_ACCEPT="image/png"))
+        self.assertEqual(response.status_code, 406)
+        self.assertEqual(response["Content-Type"], "application/json")
+
+    def test_accept_with_charset(self):
+        response = ItemsView.as_view()(self.factory.get("/", HTTP_ACCEPT="application/json; charset=utf-8"))
+        self.assertEqual(response.status_code, 200)
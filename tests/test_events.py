@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+
+import threading
+import time
+
+from django.test import RequestFactory, SimpleTestCase
+
+from supertools import events
+from supertools.views.events import EventStreamView
+
+
+class EventTests(SimpleTestCase):
+    def test_encode(self):
+        self.assertEqual(events.Event({"a": 1}, id=3, event="update").encode(),
+                         b'id: 3\nevent: update\ndata: {"a": 1}\n\n')
+        self.assertEqual(events.Event("line").encode(), b'data: "line"\n\n')
+
+
+class InMemoryBrokerTests(SimpleTestCase):
+    def setUp(self):
+        self.broker = events.InMemoryBroker()
+
+    def publish_later(self, channel, data, delay=0.05):
+        timer = threading.Timer(delay, self.broker.publish, (channel, data))
+        timer.start()
+        self.addCleanup(timer.cancel)
+
+    def test_resume_after_last_event_id(self):
+        for i in range(3):
+            self.broker.publish("a", i)
+        self.broker.publish("b", "other")
+
+        listener = self.broker.listen("a", last_event_id="1", timeout=0)
+        self.assertEqual([next(listener).data for _ in range(2)], [1, 2])
+        self.assertIsNone(next(listener))
+
+    def test_new_listeners_start_after_the_last_event(self):
+        self.broker.publish("a", "old")
+        listener = self.broker.listen("a", timeout=1)
+        self.publish_later("a", "new")
+        self.assertEqual(next(listener).data, "new")
+
+    def test_heartbeat_only_after_timeout(self):
+        listener = self.broker.listen("a", timeout=0.3)
+        self.publish_later("b", "other")
+
+        start = time.time()
+        self.assertIsNone(next(listener))
+        self.assertGreaterEqual(time.time() - start, 0.29)
+
+
+class ChannelView(EventStreamView):
+    channel = "a"
+    heartbeat_interval = 0
+
+
+class EventStreamViewTests(SimpleTestCase):
+    def test_stream(self):
+        broker = events.InMemoryBroker()
+        for i in range(3):
+            broker.publish("a", i)
+
+        request = RequestFactory().get("/", HTTP_LAST_EVENT_ID="2")
+        response = ChannelView.as_view(event_source=broker, retry=1000)(request)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+
+        content = iter(response.streaming_content)
+        self.assertEqual(next(content), b"retry: 1000\n\n")
+        self.assertEqual(next(content), b"id: 3\ndata: 2\n\n")
+        self.assertEqual(next(content), events.HEARTBEAT)
+        response.close()
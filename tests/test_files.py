@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import tempfile
+
+from django.test import RequestFactory, SimpleTestCase
+
+from supertools import files
+from supertools.views import View, ApiMixin
+
+
+class FileView(ApiMixin, View):
+    path = None
+    offload = None
+
+    def get(self, request, *args, **kwargs):
+        return self.serve_file(self.path, offload=self.offload)
+
+
+class FileResponseTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "data.bin")
+        with open(self.path, "wb") as f:
+            f.write(b"0123456789")
+        self.factory = RequestFactory()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def get(self, offload=None, **headers):
+        response = FileView.as_view(path=self.path, offload=offload)(self.factory.get("/", **headers))
+        self.addCleanup(response.close)
+        return response
+
+    def test_single_range_uses_file_wrapper(self):
+        response = self.get(HTTP_RANGE="bytes=2-4")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response["Content-Range"], "bytes 2-4/10")
+        self.assertEqual(response["Content-Length"], "3")
+        self.assertIsInstance(response.file_to_stream, files.FileRange)
+        self.assertEqual(b"".join(response.streaming_content), b"234")
+
+    def test_multiple_ranges(self):
+        response = self.get(HTTP_RANGE="bytes=0-1,-2")
+        self.assertEqual(response.status_code, 206)
+        content = b"".join(response.streaming_content)
+        self.assertIn(b"Content-Range: bytes 0-1/10\r\n\r\n01\r\n", content)
+        self.assertIn(b"Content-Range: bytes 8-9/10\r\n\r\n89\r\n", content)
+
+    def test_range_not_satisfiable(self):
+        response = self.get(HTTP_RANGE="bytes=100-")
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response["Content-Range"], "bytes */10")
+
+    def test_offload(self):
+        response = self.get(offload="x-sendfile")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["X-Sendfile"], self.path)
+        self.assertEqual(response.content, b"")
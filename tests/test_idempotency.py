@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+
+import json
+
+from django.core.cache import cache
+from django.test import RequestFactory, SimpleTestCase
+
+from supertools import http
+from supertools.views import View, ApiMixin
+
+
+class CreateView(ApiMixin, View):
+    calls = 0
+
+    def post(self, request, *args, **kwargs):
+        type(self).calls += 1
+        response = http.Created({"id": type(self).calls, "data": request.data})
+        response.set_cookie("marker", "1", max_age=10)
+        return response
+
+
+class IdempotencyTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        CreateView.calls = 0
+        self.factory = RequestFactory()
+        self.view = CreateView.as_view()
+
+    def post(self, data, key="key-1"):
+        return self.view(self.factory.post("/", json.dumps(data), content_type="application/json",
+                                           HTTP_IDEMPOTENCY_KEY=key))
+
+    def test_replays_without_running_the_handler(self):
+        first = self.post({"a": 1})
+        second = self.post({"a": 1})
+
+        self.assertEqual(CreateView.calls, 1)
+        self.assertEqual(second.status_code, 201)
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second["Content-Type"], "application/json")
+        self.assertEqual(second["Idempotent-Replayed"], "true")
+        self.assertEqual(second.cookies["marker"].value, "1")
+
+    def test_key_reused_with_other_payload(self):
+        self.post({"a": 1})
+        response = self.post({"a": 2})
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(CreateView.calls, 1)
+
+    def test_concurrent_duplicate_conflicts(self):
+        cache.add("idempotency:{}:lock".format(
+            CreateView().get_idempotency_key(self.factory.post("/", HTTP_IDEMPOTENCY_KEY="key-2"))), 1)
+        self.assertEqual(self.post({"a": 1}, key="key-2").status_code, 409)
+        self.assertEqual(CreateView.calls, 0)
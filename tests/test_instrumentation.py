@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+
+from django.core.signals import request_started
+from django.test import RequestFactory, TestCase, override_settings
+
+from supertools import http
+from supertools import instrumentation
+from supertools.views import View
+
+from .models import Author
+
+
+class AuthorsView(View):
+    instrument_queries = True
+
+    def get(self, request, *args, **kwargs):
+        names = [a.name for a in Author.objects.all()] + [a.name for a in Author.objects.all()]
+        return http.Ok(",".join(names))
+
+
+class StreamingAuthorsView(View):
+    max_queries = 1
+
+    def get(self, request, *args, **kwargs):
+        def content():
+            for author in Author.objects.all():
+                yield Author.objects.get(pk=author.pk).name
+        return http.StreamingHttpResponse(content())
+
+
+class InstrumentationTests(TestCase):
+    multi_db = True
+
+    def setUp(self):
+        Author.objects.create(name="a")
+        Author.objects.create(name="b")
+        self.factory = RequestFactory()
+
+    def test_capture_queries(self):
+        receivers = list(request_started.receivers)
+        with instrumentation.capture_queries() as stats:
+            list(Author.objects.all())
+            list(Author.objects.using("replica").all())
+        list(Author.objects.all())
+
+        self.assertEqual(stats.count, 2)
+        self.assertEqual(request_started.receivers, receivers)
+
+    def test_report_headers(self):
+        response = AuthorsView.as_view()(self.factory.get("/"))
+        self.assertEqual(response["X-Query-Count"], "2")
+        self.assertEqual(response["X-Query-Duplicates"], "2")
+
+    @override_settings(SUPERTOOLS_QUERY_BUDGET_STRICT=True)
+    def test_streamed_queries_count_against_budget(self):
+        response = StreamingAuthorsView.as_view()(self.factory.get("/"))
+        self.assertNotIn("X-Query-Count", response)
+        with self.assertRaises(instrumentation.QueryBudgetExceeded):
+            list(response.streaming_content)
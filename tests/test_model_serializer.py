@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+
+from django.test import TestCase
+
+from supertools.serializers import ModelSerializer, Field, MethodField
+
+from .benchmark import best_of, report
+from .models import Article, Author, Tag
+
+
+class ArticleSerializer(ModelSerializer):
+    model = Article
+    fields = ("id", "title", "author")
+    author_name = Field("author__name")
+
+
+class ArticleWithPropertySerializer(ModelSerializer):
+    model = Article
+    fields = ("id", "upper_title")
+
+
+class ArticleWithTagsSerializer(ModelSerializer):
+    model = Article
+    fields = ("id",)
+    tags = Field("tags__name")
+    url = MethodField()
+
+    def get_url(self, obj):
+        return "/articles/{}".format(obj.pk)
+
+
+class AuthorSerializer(ModelSerializer):
+    model = Author
+    fields = ("id",)
+    titles = Field("article__title")
+
+
+class TagSerializer(ModelSerializer):
+    model = Tag
+    fields = ("id",)
+    titles = Field("article__title")
+
+
+class ModelSerializerTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = Author.objects.create(name="Ann")
+        cls.tag = Tag.objects.create(name="django")
+        for i in range(3):
+            article = Article.objects.create(title="t{}".format(i), author=cls.author if i else None)
+            article.tags.add(cls.tag)
+
+    def test_values_path_matches_instance_path(self):
+        serializer = ArticleSerializer()
+        queryset = Article.objects.order_by("id")
+
+        self.assertIsNotNone(serializer.get_plan(Article).values_lookups)
+        from_values = serializer.serialize_many(queryset)
+        from_instances = [serializer.serialize(obj) for obj in queryset]
+        self.assertEqual(from_values, from_instances)
+        self.assertEqual(from_values[1]["author"], self.author.pk)
+        self.assertEqual(from_values[0]["author_name"], None)
+
+    def test_properties_disable_values_path(self):
+        serializer = ArticleWithPropertySerializer()
+        self.assertIsNone(serializer.get_plan(Article).values_lookups)
+        data = serializer.serialize_many(Article.objects.order_by("id"))
+        self.assertEqual(data[0], {"id": data[0]["id"], "upper_title": "T0"})
+
+    def test_related_lookups_avoid_n_plus_one(self):
+        serializer = ArticleWithTagsSerializer()
+        with self.assertNumQueries(2):
+            data = serializer.serialize_many(Article.objects.all())
+        self.assertEqual(data[0]["tags"], ["django"])
+
+    def test_reverse_foreign_key(self):
+        serializer = AuthorSerializer()
+        self.assertEqual(serializer.get_plan(Author).prefetch_related, ("article_set",))
+        with self.assertNumQueries(2):
+            data = serializer.serialize_many(Author.objects.all())
+        self.assertEqual(sorted(data[0]["titles"]), ["t1", "t2"])
+
+    def test_reverse_many_to_many(self):
+        serializer = TagSerializer()
+        self.assertEqual(serializer.get_plan(Tag).prefetch_related, ("article_set",))
+        with self.assertNumQueries(2):
+            data = serializer.serialize_many(Tag.objects.all())
+        self.assertEqual(sorted(data[0]["titles"]), ["t0", "t1", "t2"])
+
+
+class ModelSerializerBenchmark(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = Author.objects.create(name="Ann")
+        Article.objects.bulk_create(
+            Article(title="article {}".format(i), author=author) for i in range(2000))
+
+    def test_against_dict_comprehension(self):
+        serializer = ArticleSerializer()
+        queryset = Article.objects.all()
+
+        def hand_written():
+            return [{"id": a.id, "title": a.title, "author": a.author_id,
+                     "author_name": a.author.name if a.author else None}
+                    for a in queryset.select_related("author")]
+
+        def declarative():
+            return serializer.serialize_many(queryset)
+
+        self.assertEqual(hand_written(), declarative())
+        hand_written_time = best_of(hand_written)
+        declarative_time = best_of(declarative)
+        report("ModelSerializer vs dict comprehension",
+               dict_comprehension=hand_written_time, model_serializer=declarative_time)
+        # values_list skips model instantiation, it should never be slower.
+        self.assertLess(declarative_time, hand_written_time * 1.5)
@@ -0,0 +1,243 @@
+# -*- coding: utf-8 -*-
+
+import itertools
+
+from django.test import SimpleTestCase
+from hypothesis import given, settings, strategies as st
+
+from supertools import negotiation
+
+from .benchmark import best_of, report
+
+
+OFFERS = ["application/json", "text/html", "text/csv", "application/x-ndjson",
+          "text/html;level=1"]
+
+tokens = st.sampled_from(["*", "*/*", "text/*", "application/*", "*/json", "text", ""] +
+                         [offer.split(";")[0] for offer in OFFERS])
+params = st.dictionaries(st.sampled_from(["charset", "level", "q", "x"]),
+                         st.sampled_from(["1", "2", "utf-8", '"a,b"', "", "nan", "-1"]), max_size=2)
+
+
+@st.composite
+def accept_headers(draw):
+    elements = []
+    for token, element_params in draw(st.lists(st.tuples(tokens, params), max_size=5)):
+        elements.append(";".join([token] + ["{}={}".format(k, v) for k, v in element_params.items()]))
+    return draw(st.sampled_from([", ", ",", " , "])).join(elements)
+
+
+media_types = st.builds(negotiation.MediaType,
+                        st.sampled_from(["*", "text", "application"]),
+                        st.sampled_from(["*", "html", "json"]),
+                        st.dictionaries(st.sampled_from(["charset", "level"]), st.just("1"), max_size=2),
+                        st.sampled_from([0, 0.5, 1]))
+
+
+def reference_select(offers, header):
+    """Brute force `MediaTypeNegotiator.select`: every offer against every element."""
+    if header is None:
+        return offers[0] if offers else None
+
+    elements = []
+    for token, element_params, q in negotiation.parse_header(header):
+        token = "*/*" if token == "*" else token
+        type, _, subtype = token.partition("/")
+        if subtype and (type != "*" or subtype == "*"):
+            elements.append((type, subtype, element_params, q))
+
+    best = None
+    for offer in offers:
+        offer_token, offer_params, _ = negotiation.parse_header(offer)[0]
+        offer_type, _, offer_subtype = offer_token.partition("/")
+        match = None
+        for type, subtype, element_params, q in elements:
+            if type != "*" and (type != offer_type or subtype not in ("*", offer_subtype)):
+                continue
+            if any(offer_params.get(k, v) != v for k, v in element_params.items()):
+                continue
+            specificity = (0 if type == "*" else 1 if subtype == "*" else 2) + len(element_params)
+            if match is None or specificity > match[0]:
+                match = (specificity, q)
+        if match is not None and match[1] > 0 and (best is None or match[1] > best[0]):
+            best = (match[1], offer)
+
+    return best and best[1]
+
+
+weights = st.sampled_from(["", ";q=0", ";q=0.5", ";q=1", ";q=0.001", ";q=x", ";Q=0.8"])
+
+
+def headers(tokens):
+    """Accept-* header values made of `tokens` with random weights."""
+    element = st.tuples(st.sampled_from(tokens), weights).map("".join)
+    return st.lists(element, max_size=5).map(", ".join)
+
+
+def reference_select_token(offers, header, match, implicit=None, default=None):
+    """Brute force `Negotiator.select` for single token headers.
+
+    :param match: Function returning the specificity of a header token for
+        an offer, or None when it does not apply to it.
+    :param implicit: Offer acceptable with weight 0.001 when not mentioned.
+    """
+    if header is None:
+        return default if default is not None else offers[0]
+
+    best = None
+    for offer in offers:
+        weight = None
+        specificity = None
+        for token, _, q in negotiation.parse_header(header):
+            current = match(token, offer)
+            if current is not None and (specificity is None or current > specificity):
+                specificity, weight = current, q
+        if weight is None and offer == implicit:
+            weight = 0.001
+        if weight and (best is None or weight > best[0]):
+            best = (weight, offer)
+
+    return best and best[1]
+
+
+ENCODINGS = ["gzip", "br", "identity", "deflate"]
+LANGUAGES = ["en", "en-US", "en-GB", "es", "pt_BR", "zh-Hant-TW"]
+CHARSETS = ["utf-8", "iso-8859-1", "UTF-16"]
+
+
+def match_token(token, offer):
+    if token == "*":
+        return 0
+    return 1 if token == offer.lower() else None
+
+
+def match_language(token, offer):
+    if token == "*":
+        return 0
+    token = token.replace("_", "-")
+    offer = offer.lower().replace("_", "-")
+    if offer == token or offer.startswith(token + "-"):
+        return token.count("-") + 1
+    return None
+
+
+class MediaTypeNegotiatorTests(SimpleTestCase):
+    def select(self, header, offers=OFFERS):
+        return negotiation.MediaTypeNegotiator(offers).select(header)
+
+    def test_select(self):
+        self.assertEqual(self.select(None), "application/json")
+        self.assertEqual(self.select("text/*, application/json;q=0.5"), "text/html")
+        self.assertEqual(self.select("*/*;q=0.1, text/csv"), "text/csv")
+        self.assertEqual(self.select("text/html;level=1"), "text/html")
+        self.assertEqual(self.select("text/html;level=2"), "text/html")
+        self.assertIsNone(self.select("image/png, */*;q=0"))
+
+    def test_undeclared_params_are_ignored(self):
+        self.assertEqual(self.select("application/json; charset=utf-8"), "application/json")
+        self.assertEqual(self.select('text/csv;charset="utf-8";q=0.9, */*;q=0.1'), "text/csv")
+
+    @given(st.text())
+    def test_parser_never_raises(self, header):
+        negotiation.parse_header(header)
+        negotiation.parse_media_range(header)
+        self.select(header)
+
+    @given(st.lists(media_types, min_size=3, max_size=3))
+    def test_ordering_is_a_total_preorder(self, items):
+        for a, b in itertools.permutations(items, 2):
+            # Exactly one of a < b, b < a or a ~ b.
+            self.assertEqual(sum([a < b, b < a, a.sort_key() == b.sort_key()]), 1)
+        a, b, c = items
+        if not a > b and not b > c:
+            self.assertFalse(a > c)
+
+    @settings(max_examples=300)
+    @given(st.lists(st.sampled_from(OFFERS), min_size=1, max_size=4, unique=True),
+           st.one_of(st.none(), accept_headers()))
+    def test_select_matches_reference(self, offers, header):
+        self.assertEqual(self.select(header, offers), reference_select(offers, header))
+
+    def test_benchmark(self):
+        header = "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8"
+        offers = ["application/json", "text/csv"]
+        negotiator = negotiation.get_negotiator(negotiation.MediaTypeNegotiator, offers)
+        number = 10000
+
+        def intersect():
+            return negotiation.intersect_media_types(
+                negotiation.parse_and_sort_media_range(header),
+                negotiation.parse_media_range(",".join(offers)))
+
+        self.assertEqual(str(intersect()), negotiator.select(header))
+        old = best_of(intersect, number=number) / number
+        new = best_of(lambda: negotiator.select(header), number=number) / number
+        report("Accept negotiation", intersect_media_types=old, negotiator=new)
+        self.assertLess(new, old)
+
+
+class EncodingNegotiatorTests(SimpleTestCase):
+    def select(self, header, offers=("gzip", "identity")):
+        return negotiation.EncodingNegotiator(offers).select(header)
+
+    def test_select(self):
+        self.assertEqual(self.select(None), "identity")
+        self.assertEqual(self.select(None, ["gzip"]), "gzip")
+        self.assertEqual(self.select("gzip, br"), "gzip")
+        self.assertEqual(self.select("br"), "identity")
+        self.assertEqual(self.select("*;q=0.5, gzip;q=0.1"), "identity")
+        self.assertIsNone(self.select("br, identity;q=0"))
+        self.assertIsNone(self.select("br, *;q=0"))
+
+    @settings(max_examples=300)
+    @given(st.lists(st.sampled_from(ENCODINGS), min_size=1, max_size=4, unique=True),
+           st.one_of(st.none(), headers(ENCODINGS + ["*", "compress"])))
+    def test_select_matches_reference(self, offers, header):
+        default = "identity" if "identity" in offers else None
+        self.assertEqual(self.select(header, offers),
+                         reference_select_token(offers, header, match_token, "identity", default))
+
+
+class LanguageNegotiatorTests(SimpleTestCase):
+    def select(self, header, offers=("en-US", "es", "pt-BR")):
+        return negotiation.LanguageNegotiator(offers).select(header)
+
+    def test_select(self):
+        self.assertEqual(self.select(None), "en-US")
+        self.assertEqual(self.select("pt"), "pt-BR")
+        self.assertEqual(self.select("en, es;q=0.9"), "en-US")
+        self.assertEqual(self.select("en;q=1, en-us;q=0.2, es;q=0.5"), "es")
+        self.assertEqual(self.select("PT_br"), "pt-BR")
+        self.assertIsNone(self.select("en-GB, fr"))
+        self.assertIsNone(self.select("e"))
+
+    @settings(max_examples=300)
+    @given(st.lists(st.sampled_from(LANGUAGES), min_size=1, max_size=4, unique=True),
+           st.one_of(st.none(), headers(LANGUAGES + ["*", "en-us-x", "zh", "zh-hant", "pt"])))
+    def test_select_matches_reference(self, offers, header):
+        self.assertEqual(self.select(header, offers),
+                         reference_select_token(offers, header, match_language))
+
+
+class CharsetNegotiatorTests(SimpleTestCase):
+    def select(self, header, offers=("utf-8", "iso-8859-1")):
+        return negotiation.CharsetNegotiator(offers).select(header)
+
+    def test_select(self):
+        self.assertEqual(self.select(None), "utf-8")
+        self.assertEqual(self.select("ISO-8859-1, *;q=0.5"), "iso-8859-1")
+        self.assertIsNone(self.select("utf-16"))
+
+    @settings(max_examples=300)
+    @given(st.lists(st.sampled_from(CHARSETS), min_size=1, max_size=3, unique=True),
+           st.one_of(st.none(), headers(CHARSETS + ["*", "utf-16"])))
+    def test_select_matches_reference(self, offers, header):
+        self.assertEqual(self.select(header, offers),
+                         reference_select_token(offers, header, match_token))
+
+
+class NegotiatorParserTests(SimpleTestCase):
+    @given(st.text(), st.sampled_from([negotiation.EncodingNegotiator, negotiation.LanguageNegotiator,
+                                       negotiation.CharsetNegotiator]))
+    def test_select_never_raises(self, header, cls):
+        cls(["gzip", "en-US", "utf-8"]).select(header)
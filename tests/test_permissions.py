@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+
+from django.core.cache import cache
+from django.test import RequestFactory, SimpleTestCase
+
+from supertools import exceptions as exc
+from supertools import http
+from supertools import permissions as perms
+from supertools.views import View
+
+
+calls = []
+
+
+@perms.permission(cost=10)
+def expensive(view):
+    calls.append("expensive")
+    return True
+
+
+@perms.permission(cost=1)
+def cheap_denied(view):
+    calls.append("cheap_denied")
+    return False
+
+
+def granted_none(view):
+    calls.append("granted_none")
+    return None
+
+
+@perms.permission(ttl=60)
+def cached_check(view):
+    calls.append("cached_check")
+    return view.kwargs.get("allowed", 1)
+
+
+@perms.permission(ttl=60)
+def cached_response(view):
+    calls.append("cached_response")
+    return http.Forbidden("custom")
+
+
+class ItemView(View):
+    def get(self, request, *args, **kwargs):
+        return http.Ok("ok")
+
+
+class PermissionsTests(SimpleTestCase):
+    def setUp(self):
+        del calls[:]
+        cache.clear()
+        self.factory = RequestFactory()
+
+    def make_view(self, **kwargs):
+        view = ItemView()
+        view.request = self.factory.get("/")
+        view.kwargs = kwargs
+        return view
+
+    def test_cheaper_permissions_short_circuit(self):
+        self.assertEqual(perms.sort_by_cost((expensive, granted_none, cheap_denied)),
+                         [granted_none, cheap_denied, expensive])
+        view = ItemView.as_view(permissions=(expensive, granted_none, cheap_denied))
+        with self.assertRaises(exc.Forbidden):
+            view(self.factory.get("/"))
+        self.assertEqual(calls, ["granted_none", "cheap_denied"])
+
+    def test_only_false_is_forbidden(self):
+        response = ItemView.as_view(permissions=(granted_none, expensive))(self.factory.get("/"))
+        self.assertEqual(response.status_code, 200)
+
+    def test_memoized_per_request(self):
+        view = self.make_view()
+        self.assertIs(perms.evaluate(expensive, view), True)
+        self.assertIs(perms.evaluate(expensive, view), True)
+        self.assertEqual(calls, ["expensive"])
+
+        perms.evaluate(expensive, self.make_view())
+        self.assertEqual(calls, ["expensive", "expensive"])
+
+    def test_ttl_caches_outcome(self):
+        self.assertIs(perms.evaluate(cached_check, self.make_view()), True)
+        self.assertIs(perms.evaluate(cached_check, self.make_view()), True)
+        self.assertEqual(calls, ["cached_check"])
+
+        # Other key, cached as denied.
+        self.assertIs(perms.evaluate(cached_check, self.make_view(allowed=False)), False)
+        self.assertIs(perms.evaluate(cached_check, self.make_view(allowed=False)), False)
+        self.assertEqual(calls, ["cached_check", "cached_check"])
+
+    def test_ttl_never_caches_responses(self):
+        for _ in range(2):
+            result = perms.evaluate(cached_response, self.make_view())
+            self.assertIsInstance(result, http.Forbidden)
+        self.assertEqual(calls, ["cached_response", "cached_response"])
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import tempfile
+
+from django.contrib.auth.models import AnonymousUser, User
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from supertools import http
+from supertools.views import View
+
+
+class SlowView(View):
+    def get(self, request, *args, **kwargs):
+        return http.Ok("done")
+
+
+@override_settings(SUPERTOOLS_PROFILER_ENABLED=True)
+class ProfilingTests(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def get(self, user, **params):
+        request = self.factory.get("/", params)
+        request.user = user
+        return SlowView.as_view()(request)
+
+    def test_requires_superuser(self):
+        for user in (AnonymousUser(), User(is_superuser=False)):
+            response = self.get(user, _profile="cprofile")
+            self.assertEqual(response.content, b"done")
+            self.assertNotIn("X-Profile-File", response)
+
+    def test_disabled(self):
+        with override_settings(SUPERTOOLS_PROFILER_ENABLED=False):
+            response = self.get(User(is_superuser=True), _profile="cprofile")
+        self.assertEqual(response.content, b"done")
+
+    def test_renders_profile(self):
+        response = self.get(User(is_superuser=True), _profile="cprofile")
+        self.assertEqual(response["Content-Type"], "text/html")
+        self.assertIn(b"&quot;profiler&quot;: &quot;cprofile&quot;", response.content)
+
+    def test_saves_profile(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+
+        with override_settings(SUPERTOOLS_PROFILER_DIR=directory):
+            response = self.get(User(is_superuser=True), _profile="cprofile")
+        self.assertEqual(response.content, b"done")
+        path = response["X-Profile-File"]
+        self.assertEqual(os.path.dirname(path), directory)
+        self.assertTrue(path.endswith(".prof") and os.path.getsize(path) > 0)
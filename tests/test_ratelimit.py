@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+
+from django.test import RequestFactory, SimpleTestCase
+
+from supertools import http
+from supertools import ratelimit
+from supertools.views import View
+
+from .benchmark import best_of, report
+
+
+def key_by_header(request):
+    return request.META.get("HTTP_X_CLIENT", "")
+
+
+class LimitedView(View):
+    rate_limit = "2/m"
+    rate_limit_backend = ratelimit.LocalBackend()
+
+    def get(self, request, *args, **kwargs):
+        return http.Ok("ok")
+
+
+class CustomKeyView(LimitedView):
+    rate_limit_key = key_by_header
+    rate_limit_backend = ratelimit.CacheBackend()
+
+
+class ParseRateTests(SimpleTestCase):
+    def test_parse(self):
+        self.assertEqual(ratelimit.parse_rate("100/m"), (100, 60))
+        self.assertEqual(ratelimit.parse_rate("10/5m"), (10, 300))
+        with self.assertRaises(ValueError):
+            ratelimit.parse_rate("10/w")
+
+
+class LocalBackendTests(SimpleTestCase):
+    def test_token_bucket(self):
+        backend = ratelimit.LocalBackend()
+        rate = ratelimit.parse_rate("2/m")
+        self.assertEqual(backend.consume("a", rate), 0)
+        self.assertEqual(backend.consume("a", rate), 0)
+        self.assertAlmostEqual(backend.consume("a", rate), 30, delta=1)
+        self.assertEqual(backend.consume("b", rate), 0)
+
+    def test_prune_keeps_buckets_not_refilled(self):
+        backend = ratelimit.LocalBackend(max_keys=1, prune_interval=0)
+        daily = ratelimit.parse_rate("1/d")
+        backend.consume("slow", daily)
+        backend._buckets["slow"] = (0, backend._buckets["slow"][1] - 120, daily)
+
+        minute = ratelimit.parse_rate("100/m")
+        backend.consume("full", minute)
+        backend._buckets["full"] = (99, backend._buckets["full"][1] - 120, minute)
+        backend.consume("other", minute)
+
+        self.assertIn("slow", backend._buckets)
+        self.assertNotIn("full", backend._buckets)
+        self.assertGreater(backend.consume("slow", daily), 0)
+
+
+class CacheBackendTests(SimpleTestCase):
+    def test_fixed_window(self):
+        backend = ratelimit.CacheBackend(prefix="test-window")
+        rate = ratelimit.parse_rate("2/h")
+        self.assertEqual(backend.consume("a", rate), 0)
+        self.assertEqual(backend.consume("a", rate), 0)
+        self.assertGreater(backend.consume("a", rate), 0)
+
+
+class ViewRateLimitTests(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def test_too_many_requests_with_retry_after(self):
+        view = LimitedView.as_view()
+        request = self.factory.get("/", REMOTE_ADDR="10.0.0.1")
+        self.assertEqual(view(request).status_code, 200)
+        self.assertEqual(view(request).status_code, 200)
+
+        response = view(request)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "30")
+        self.assertEqual(response.content, b"Too many requests")
+
+    def test_custom_key_function(self):
+        view = CustomKeyView.as_view()
+        for _ in range(2):
+            self.assertEqual(view(self.factory.get("/", HTTP_X_CLIENT="a")).status_code, 200)
+        self.assertEqual(view(self.factory.get("/", HTTP_X_CLIENT="a")).status_code, 429)
+        self.assertEqual(view(self.factory.get("/", HTTP_X_CLIENT="b")).status_code, 200)
+
+
+class RateLimitBenchmark(SimpleTestCase):
+    def test_check_overhead(self):
+        request = RequestFactory().get("/", REMOTE_ADDR="10.0.0.1")
+        backend = ratelimit.LocalBackend()
+        number = 10000
+
+        elapsed = best_of(lambda: ratelimit.check(request, "1000000/s", "ip", "bench", backend),
+                          number=number)
+        report("ratelimit.check (LocalBackend)", per_check=elapsed / number)
+        self.assertLess(elapsed / number, 50e-6)
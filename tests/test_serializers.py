@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+
+import json
+from collections import OrderedDict
+
+from django.test import RequestFactory, SimpleTestCase, TestCase
+
+from supertools import serializers
+
+from .models import Author
+
+
+class NdJsonTests(SimpleTestCase):
+    def setUp(self):
+        self.serializer = serializers.NdJson()
+
+    def dumps(self, data):
+        return b"".join(self.serializer.dumps(data))
+
+    def test_dumps_one_line_per_record(self):
+        self.assertEqual(self.dumps(iter([{"a": 1}, [2]])), b'{"a": 1}\n[2]\n')
+
+    def test_dumps_scalars_as_single_record(self):
+        self.assertEqual(self.dumps({"a": 1}), b'{"a": 1}\n')
+        self.assertEqual(self.dumps("done"), b'"done"\n')
+        self.assertEqual(self.dumps(b"done"), b'"done"\n')
+        self.assertEqual(self.dumps(None), b"")
+
+    def test_jsonl_alias(self):
+        container = serializers.SerializersContainer(serializers.Json(), serializers.NdJson())
+        self.assertIsInstance(container.get_by_content_type("application/jsonl"), serializers.NdJson)
+        self.assertIsInstance(container.get_by_content_type("application/json; charset=utf-8"),
+                              serializers.Json)
+
+    def test_loads_is_lazy(self):
+        request = RequestFactory().post("/", data=b'{"a": 1}\n\n[2]\n',
+                                        content_type=serializers.NdJson.content_type)
+        records = self.serializer.loads(request)
+        self.assertEqual(next(records), {"a": 1})
+        self.assertEqual(list(records), [[2]])
+
+
+class NdJsonQuerySetTests(TestCase):
+    def test_dumps_does_not_cache_querysets(self):
+        for name in "abc":
+            Author.objects.create(name=name)
+        queryset = Author.objects.values_list("name", flat=True).order_by("name")
+
+        lines = serializers.NdJson().dumps(queryset)
+        self.assertEqual(next(lines), b'"a"\n')
+        self.assertIsNone(queryset._result_cache)
+        self.assertEqual(list(lines), [b'"b"\n', b'"c"\n'])
+
+
+class CsvTests(SimpleTestCase):
+    def setUp(self):
+        self.serializer = serializers.Csv()
+
+    def dumps(self, data):
+        return b"".join(self.serializer.dumps(data))
+
+    def test_rows_from_dicts(self):
+        self.assertEqual(self.dumps(iter([{"b": 2, "a": 1}, {"a": 3}])),
+                         b"a,b\r\n1,2\r\n3,\r\n")
+
+    def test_dict_is_a_single_row(self):
+        self.assertEqual(self.dumps({"_message": "Not found."}),
+                         b"_message\r\nNot found.\r\n")
+
+    def test_string_is_a_single_cell(self):
+        self.assertEqual(self.dumps("done"), b"done\r\n")
+
+    def test_unsupported_rows_fail_before_streaming(self):
+        with self.assertRaises(TypeError):
+            self.serializer.dumps([1, 2])
+
+
+class ContextTemplate(object):
+    def render(self, context):
+        return context
+
+
+class HtmlJsonTests(SimpleTestCase):
+    def dumps(self, data, **options):
+        serializer = serializers.HtmlJson(**options)
+        serializer.template = ContextTemplate()
+        return serializer.dumps(data, RequestFactory().get("/"))
+
+    def test_max_items(self):
+        context = self.dumps({"items": list(range(5)), "gen": iter(range(5))}, max_items=3)
+        self.assertTrue(context["truncated"])
+        self.assertEqual(json.loads(context["data"]), {
+            "gen": [0, 1, 2, "... truncated"],
+            "items": [0, 1, 2, "... 2 more items truncated"],
+        })
+
+    def test_max_nodes(self):
+        context = self.dumps([[1], [2], [3]], max_nodes=3)
+        self.assertTrue(context["truncated"])
+        self.assertEqual(json.loads(context["data"]), [[1], ["... 1 more items truncated"],
+                                                       ["... 1 more items truncated"]])
+
+    def test_max_length(self):
+        context = self.dumps("x" * 100, max_length=10)
+        self.assertTrue(context["truncated"])
+        self.assertEqual(context["data"], '"xxxxxxxxx\n... truncated')
+
+    def test_not_truncated(self):
+        context = self.dumps({"b": 1, "a": 2})
+        self.assertFalse(context["truncated"])
+        self.assertEqual(context["data"], '{\n    "a": 2,\n    "b": 1\n}')
+
+    def test_sort_keys_threshold(self):
+        data = OrderedDict([("b", 1), ("a", 2)])
+        # Three nodes: the dict and its two values.
+        self.assertLess(self.dumps(data, sort_keys_max_nodes=3)["data"].index('"a"'),
+                        self.dumps(data, sort_keys_max_nodes=3)["data"].index('"b"'))
+        self.assertGreater(self.dumps(data, sort_keys_max_nodes=2)["data"].index('"a"'),
+                           self.dumps(data, sort_keys_max_nodes=2)["data"].index('"b"'))
+
+    def test_truncated_dict_with_non_string_keys(self):
+        context = self.dumps(dict((i, i) for i in range(150)))
+        data = json.loads(context["data"])
+        self.assertEqual(len(data), 101)
+        self.assertEqual(data["..."], "... 50 more items truncated")
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+
+import hashlib
+import io
+import tracemalloc
+
+from django.core.handlers.wsgi import WSGIRequest
+from django.test import SimpleTestCase
+
+from supertools import exceptions as exc
+from supertools import serializers
+
+
+BOUNDARY = "supertoolsboundary"
+MB = 1024 * 1024
+
+
+class MultiPartStream(io.RawIOBase):
+    """wsgi.input producing a multipart body with a file of `size` zero bytes
+    lazily, so the request body is never held in memory."""
+
+    def __init__(self, size, chunk_size=MB):
+        head = ('--{0}\r\nContent-Disposition: form-data; name="title"\r\n\r\nreport\r\n'
+                '--{0}\r\nContent-Disposition: form-data; name="file"; filename="data.bin"\r\n'
+                'Content-Type: application/octet-stream\r\n\r\n').format(BOUNDARY).encode()
+        tail = "\r\n--{}--\r\n".format(BOUNDARY).encode()
+        self.parts = [(head, 1), (b"\0" * chunk_size, size // chunk_size), (tail, 1)]
+        self.length = len(head) + size + len(tail)
+        self.buffer = b""
+
+    def readable(self):
+        return True
+
+    def readinto(self, target):
+        while not self.buffer and self.parts:
+            data, count = self.parts[0]
+            self.buffer = data
+            if count == 1:
+                self.parts.pop(0)
+            else:
+                self.parts[0] = (data, count - 1)
+        n = min(len(target), len(self.buffer))
+        target[:n] = self.buffer[:n]
+        self.buffer = self.buffer[n:]
+        return n
+
+
+def make_request(size):
+    stream = MultiPartStream(size)
+    return WSGIRequest({
+        "REQUEST_METHOD": "POST",
+        "PATH_INFO": "/",
+        "CONTENT_TYPE": "multipart/form-data; boundary={}".format(BOUNDARY),
+        "CONTENT_LENGTH": str(stream.length),
+        "wsgi.input": io.BufferedReader(stream),
+    })
+
+
+class MultiPartTests(SimpleTestCase):
+    def test_merges_fields_and_files_with_checksum(self):
+        data = serializers.MultiPart().loads(make_request(MB))
+        self.assertEqual(data["title"], "report")
+        self.assertEqual(data["file"].size, MB)
+        self.assertEqual(data["file"].checksum, hashlib.sha256(b"\0" * MB).hexdigest())
+
+    def test_part_size_limit(self):
+        with self.assertRaises(exc.RequestEntityTooLarge):
+            serializers.MultiPart(max_part_size=MB // 2).loads(make_request(MB))
+
+    def test_warns_when_body_already_parsed(self):
+        request = make_request(MB)
+        request.FILES
+        with self.assertLogs("supertools.serializers", "WARNING"):
+            serializers.MultiPart().loads(request)
+
+    def test_memory_is_bounded_for_large_uploads(self):
+        size = 128 * MB
+        request = make_request(size)
+
+        tracemalloc.start()
+        try:
+            data = serializers.MultiPart().loads(request)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+        self.assertEqual(data["file"].size, size)
+        print("\nMultiPart 128MB upload: peak traced memory={:.1f}MB".format(float(peak) / MB))
+        self.assertLess(peak, 16 * MB)